@@ -6,6 +6,138 @@ import { serverEnv } from "@/lib/env"
 
 export const dynamic = 'force-dynamic';
 export const maxDuration = 300; // 5 minutes timeout
+// Slate runs defer the fixtures that would not finish in this many seconds,
+// leaving the rest of maxDuration for startup and the response
+const slateTimeBudget = 240;
+// Slate runs pass --resume: a run cut short by the timeout or a crash continues
+// from its checkpoint, and a finished one starts a new run
+const slateArgs = ['--time_budget', String(slateTimeBudget), '--resume'];
+
+// Optional resident prediction server (nba_betting/prediction_server.py).
+// When set, requests are forwarded to it instead of spawning a new Python process.
+const predictionServerUrl = process.env.PREDICTION_SERVER_URL;
+
+// One row of the prediction server's `results` (run_predictions.process_fixture)
+type PredictionResult = { fixture_id: string; saved: boolean; [key: string]: unknown };
+
+function summarizeResults(results: PredictionResult[], dryRun: boolean) {
+  // Readable lines for the Run Predictions page, one per fixture as summarizeEvents gives them
+  const byFixture = new Map<string, PredictionResult[]>();
+  for (const result of results) {
+    const rows = byFixture.get(result.fixture_id);
+    if (rows) {
+      rows.push(result);
+    } else {
+      byFixture.set(result.fixture_id, [result]);
+    }
+  }
+  return [...byFixture.entries()].map(([fixtureId, rows]) => {
+    const saveErrors = dryRun ? 0 : rows.filter((r) => !r.saved).length;
+    return `Fixture ${fixtureId}: ${rows.length} predictions, ${saveErrors} save errors`;
+  });
+}
+
+async function runOnPredictionServer(fixtureId: string | null, dryRun: boolean, message: string) {
+  const endpoint = fixtureId ? '/predict/fixture' : '/predict/slate';
+  const headers: Record<string, string> = { 'Content-Type': 'application/json' };
+  if (process.env.PREDICTION_SERVER_TOKEN) {
+    headers['api-token'] = process.env.PREDICTION_SERVER_TOKEN;
+  }
+
+  let response: Response;
+  try {
+    response = await fetch(`${predictionServerUrl}${endpoint}`, {
+      method: 'POST',
+      headers,
+      body: JSON.stringify({ fixture_id: fixtureId, dry_run: dryRun }),
+      cache: 'no-store',
+    });
+  } catch (error) {
+    console.error(`Prediction server at ${predictionServerUrl} is unreachable:`, error);
+    return new NextResponse(JSON.stringify({ 
+      error: `Prediction server at ${predictionServerUrl} is unreachable`,
+      details: error instanceof Error ? error.message : String(error)
+    }), {
+      status: 502,
+      headers: { 'Content-Type': 'application/json' },
+    });
+  }
+
+  // Read the body as text first: a proxy or a crashed server may not answer with JSON
+  const body = await response.text();
+  let result;
+  try {
+    result = JSON.parse(body);
+  } catch {
+    result = null;
+  }
+
+  if (!response.ok || result === null) {
+    return new NextResponse(JSON.stringify({ 
+      error: `Prediction server at ${predictionServerUrl} request failed`,
+      status: response.status,
+      details: result ?? body
+    }), {
+      status: response.ok || response.status >= 500 ? 502 : response.status,
+      headers: { 'Content-Type': 'application/json' },
+    });
+  }
+
+  return new NextResponse(JSON.stringify({ 
+    success: true, 
+    message,
+    predictions: result.predictions,
+    dryRun,
+    results: result.results,
+    output: summarizeResults(result.results ?? [], dryRun),
+    computeSeconds: result.compute_seconds,
+    dataLoadedAt: result.data_loaded_at
+  }), {
+    status: 200,
+    headers: { 'Content-Type': 'application/json' },
+  });
+}
+
+// run_predictions.py is started with `--events -`, so stdout is one JSON event per line
+type PredictionEvent = { event: string; [key: string]: unknown };
+
+function parseEvents(output: string): PredictionEvent[] {
+  const events: PredictionEvent[] = [];
+  for (const line of output.split('\n')) {
+    if (!line.startsWith('{')) continue;
+    try {
+      events.push(JSON.parse(line));
+    } catch {
+      // Ignore partial or non-event lines
+    }
+  }
+  return events;
+}
+
+function summarizeEvents(output: string) {
+  const events = parseEvents(output);
+  const runEnd = events.find((e) => e.event === 'run_end');
+  const fixtures = events.filter((e) => e.event === 'fixture');
+  const slate = events.find((e) => e.event === 'slate');
+  const deferred = (slate?.deferred ?? []) as PredictionEvent[];
+  const skipped = (slate?.skipped ?? []) as PredictionEvent[];
+  const errors = events.filter((e) => e.event === 'error' || e.event === 'stage_error');
+  // Readable lines for the Run Predictions page
+  const lines = [
+    ...fixtures.map((f) => `Fixture ${f.fixture_id}: ${f.predictions} predictions, ${f.skipped_players} players without history, ${f.save_errors} save errors`),
+    ...deferred.map((f) => `Fixture ${f.fixture_id}: deferred by the time budget (tip-off ${f.tip_off})`),
+    ...skipped.map((f) => `Fixture ${f.fixture_id}: skipped, ${f.reason}`),
+    ...errors.map((e) => `Error in ${e.stage}: ${e.error ?? ''}`.trim()),
+  ];
+  return {
+    predictions: typeof runEnd?.predictions === 'number' ? runEnd.predictions : null,
+    fixtures,
+    deferred,
+    skipped,
+    errors,
+    output: lines,
+  };
+}
 
 export async function GET(request: NextRequest) {
   try {
@@ -26,6 +158,10 @@ export async function GET(request: NextRequest) {
     // Check for specific fixture
     const fixtureId = request.nextUrl.searchParams.get('fixture_id');
 
+    if (predictionServerUrl) {
+      return await runOnPredictionServer(fixtureId, dryRun, 'Predictions generated successfully');
+    }
+
     // Construct the path to the Python script
     const workspaceRoot = process.cwd();
     const scriptPath = path.join(workspaceRoot, 'nba_betting', 'run_predictions.py');
@@ -56,7 +192,7 @@ export async function GET(request: NextRequest) {
     }
 
     // Build command arguments
-    const args = [scriptPath];
+    const args = [scriptPath, '--events', '-'];
     
     if (dryRun) {
       args.push('--dry_run');
@@ -64,6 +200,8 @@ export async function GET(request: NextRequest) {
     
     if (fixtureId) {
       args.push('--fixture_id', fixtureId);
+    } else {
+      args.push(...slateArgs);
     }
 
     // Set up environment variables for the Python process
@@ -116,7 +254,6 @@ export async function GET(request: NextRequest) {
     // Capture stdout data
     python.stdout.on('data', (data) => {
       output += data.toString();
-      console.log(`Python stdout: ${data}`);
     });
 
     // Capture stderr data
@@ -144,16 +281,18 @@ export async function GET(request: NextRequest) {
       });
     }
 
-    // Extract prediction count from output (assuming it's printed)
-    const predictionCountMatch = output.match(/Generated a total of (\d+) predictions/);
-    const predictionCount = predictionCountMatch ? parseInt(predictionCountMatch[1], 10) : null;
+    const summary = summarizeEvents(output);
 
     return new NextResponse(JSON.stringify({ 
       success: true, 
       message: 'Predictions generated successfully',
-      predictions: predictionCount,
+      predictions: summary.predictions,
       dryRun,
-      output: output.split('\n')
+      fixtures: summary.fixtures,
+      deferred: summary.deferred,
+      skipped: summary.skipped,
+      errors: summary.errors,
+      output: summary.output
     }), {
       status: 200,
       headers: { 'Content-Type': 'application/json' },
@@ -182,6 +321,10 @@ export async function POST(request: NextRequest) {
       });
     }
 
+    if (predictionServerUrl) {
+      return await runOnPredictionServer(null, false, 'Scheduled predictions generated successfully');
+    }
+
     // Same logic as GET but designed for automated runs
     const workspaceRoot = process.cwd();
     const scriptPath = path.join(workspaceRoot, 'nba_betting', 'run_predictions.py');
@@ -232,7 +375,7 @@ export async function POST(request: NextRequest) {
     for (const executable of pythonExecutables) {
       try {
         console.log(`Attempting to spawn Python process with executable: ${executable}`);
-        python = spawn(executable, [scriptPath], { env });
+        python = spawn(executable, [scriptPath, '--events', '-', ...slateArgs], { env });
         executableUsed = executable;
         break;
       } catch (error) {
@@ -259,7 +402,6 @@ export async function POST(request: NextRequest) {
     // Capture stdout data
     python.stdout.on('data', (data) => {
       output += data.toString();
-      console.log(`Python stdout: ${data}`);
     });
 
     // Capture stderr data
@@ -287,15 +429,16 @@ export async function POST(request: NextRequest) {
       });
     }
 
-    // Extract prediction count from output
-    const predictionCountMatch = output.match(/Generated a total of (\d+) predictions/);
-    const predictionCount = predictionCountMatch ? parseInt(predictionCountMatch[1], 10) : null;
+    const summary = summarizeEvents(output);
 
     return new NextResponse(JSON.stringify({ 
       success: true, 
       message: 'Scheduled predictions generated successfully',
-      predictions: predictionCount,
-      output: output.split('\n')
+      predictions: summary.predictions,
+      fixtures: summary.fixtures,
+      deferred: summary.deferred,
+      skipped: summary.skipped,
+      errors: summary.errors
     }), {
       status: 200,
       headers: { 'Content-Type': 'application/json' },
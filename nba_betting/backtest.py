@@ -0,0 +1,266 @@
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import run_predictions
+from data_audit import load_tables
+from markets import MARKETS, market_key, market_stats
+from odds_table import american_to_decimal, best_lines, pick_side, price_edges
+from player_identity import PlayerResolver
+from prop_probability import bootstrap_props, error_rows, fit_error_model, middle_lines
+from prop_windows import as_of_windows, history_arrays, prediction_errors
+from run_logging import add_logging_arguments, setup_from_args
+
+# Replays stored odds snapshots (run_predictions.py --odds_snapshots) against the
+# predictions run_predictions.py would have made before each game, and scores the
+# recommended side against the box score. Every prop of the season is predicted in
+# one vectorized sweep over per-player date-sorted arrays, so thresholds and
+# buckets can be re-cut without predicting again.
+DEFAULT_EDGE_BUCKETS = [0, 1, 2, 3, 5]
+DEFAULT_THRESHOLDS = [0, 0.5, 1, 1.5, 2, 3]
+DEFAULT_RESAMPLES = 100
+PROBABILITY_BUCKETS = [0.5, 0.55, 0.6, 0.65, 0.7, 0.75, 0.8, 0.9, 1.0]
+BET_KEY = ['game_id', 'player_id', 'market']
+
+def load_snapshots(paths):
+    """Read snapshot CSVs; market names are mapped to market keys and unknown markets dropped."""
+    snapshots = pd.concat([pd.read_csv(path) for path in paths], ignore_index=True)
+    markets = snapshots['market'].astype(str)
+    snapshots['market'] = markets.where(markets.isin(MARKETS), markets.map(market_key))
+    snapshots['captured_at'] = pd.to_datetime(snapshots['captured_at'], utc=True, format='mixed')
+    return snapshots.dropna(subset=['market', 'line'])
+
+def closing_lines(snapshots, game_dates):
+    """The last snapshot of every book's line taken before the game started."""
+    snapshots = snapshots.merge(game_dates.rename('start_date'), left_on='game_id', right_index=True)
+    snapshots = snapshots[snapshots['captured_at'] < snapshots['start_date']]
+    snapshots = snapshots.sort_values('captured_at', kind='mergesort')
+    return snapshots.drop_duplicates(BET_KEY + ['sportsbook', 'side'], keep='last')
+
+def line_error_model(history, all_params, priced, packed, before=None):
+    """An error model fit against the closing lines of the priced props where a
+    market has enough of them, and on box scores alone (prediction_errors)
+    elsewhere. --calibration_out saves it for run_predictions.py.
+
+    packed are the priced props' windows (values, weights, factors, lengths).
+    With before, only games and props before that time are used.
+    """
+    if before is not None:
+        history = history[history['start_date'] < before]
+    markets = priced['market'].unique()
+    error_model = prediction_errors(history, all_params, markets)
+    earlier = np.ones(len(priced), dtype=bool) if before is None else (priced['start_date'] < before).to_numpy()
+    lines = middle_lines(priced['line_over'].to_numpy(dtype=float), priced['line_under'].to_numpy(dtype=float))
+    for market in markets:
+        rows = earlier & (priced['market'] == market).to_numpy()
+        model = fit_error_model(packed[0][rows], packed[1][rows], packed[2][rows], priced['actual'].to_numpy(dtype=float)[rows],
+                                lines=lines[rows])
+        if model is not None:
+            error_model[market] = model
+    return error_model
+
+def backtest(player_history, snapshots, all_params, resamples=DEFAULT_RESAMPLES, seed=0, error_model=None):
+    """Return one row per prop with a closing line and a result.
+
+    Players are matched to player_history like run_predictions.py does. The
+    side is the more likely one by bootstrap probability, or the one with the
+    larger edge when resamples is 0. Each month's props are resampled with an
+    error model (line_error_model) fit only on the games and closing lines
+    before that month, as a live run would have had it. If error_model is a
+    dict, the error model fit on every prop is stored in it. Columns include side, line, price,
+    projected_value, actual, edge (in the bet's favour), probability, result
+    ('win', 'loss' or 'push') and profit per unit staked.
+    """
+    history = player_history.assign(start_date=pd.to_datetime(player_history['start_date'], utc=True))
+    resolver = PlayerResolver.from_history(history)
+    snapshot_ids = snapshots['player_id'].unique()
+    resolved = {player_id: resolver.resolve(player_id)[0] for player_id in snapshot_ids}
+    snapshots = snapshots.assign(player_id=snapshots['player_id'].map(resolved)).dropna(subset=['player_id'])
+
+    game_dates = history.groupby('game_id')['start_date'].min()
+    lines = closing_lines(snapshots, game_dates)
+    props = lines[BET_KEY].drop_duplicates().merge(game_dates.rename('start_date'), left_on='game_id', right_index=True)
+    props = props.reset_index(drop=True)
+
+    stats = [stat for stat in market_stats(props['market'].unique()) if stat in history.columns]
+    windows = as_of_windows(history_arrays(history, stats), props, all_params)
+    props['projected_value'] = windows['projection']
+    props['actual'] = windows['actual']
+    usable = props['projected_value'].notna().to_numpy() & props['actual'].notna().to_numpy()
+
+    priced = price_edges(best_lines(lines, key=BET_KEY), props[usable], key=BET_KEY)
+    packed = [windows[name][usable] for name in ('values', 'weights', 'factors', 'lengths')]
+    if error_model is not None:
+        error_model.update(line_error_model(history, all_params, priced, packed))
+    if resamples:
+        priced['over_probability'] = np.nan
+        priced['under_probability'] = np.nan
+        months = priced['start_date'].dt.tz_convert(None).dt.to_period('M')
+        for month in sorted(months.unique()):
+            rows = (months == month).to_numpy()
+            error_model = line_error_model(history, all_params, priced, packed, before=month.start_time.tz_localize('UTC'))
+            bootstrap = bootstrap_props(*[array[rows] for array in packed], priced['line_over'].to_numpy(dtype=float)[rows],
+                                        priced['line_under'].to_numpy(dtype=float)[rows], resamples=resamples, seed=seed,
+                                        errors=error_rows(error_model, priced['market'].to_numpy()[rows]))
+            priced.loc[rows, 'over_probability'] = bootstrap['p_over']
+            priced.loc[rows, 'under_probability'] = bootstrap['p_under']
+        priced = pick_side(priced, priced['under_probability'].isna() | (priced['over_probability'] >= priced['under_probability']))
+        priced['probability'] = priced['over_probability'].where(priced['side'] == 'over', priced['under_probability'])
+    else:
+        priced['probability'] = np.nan
+
+    over = (priced['side'] == 'over').to_numpy()
+    priced['edge'] = np.where(over, priced['edge'], -priced['edge'])
+    won = np.where(over, priced['actual'] > priced['line'], priced['actual'] < priced['line'])
+    push = (priced['actual'] == priced['line']).to_numpy()
+    priced['result'] = np.where(push, 'push', np.where(won, 'win', 'loss'))
+    decimal_price = american_to_decimal(priced['price'].fillna(-110))
+    priced['profit'] = np.where(push, 0.0, np.where(won, decimal_price - 1, -1.0))
+    return priced[BET_KEY + ['start_date', 'side', 'line', 'price', 'sportsbook', 'books', 'projected_value', 'actual',
+                             'edge', 'probability', 'result', 'profit']].reset_index(drop=True)
+
+def summarize(bets, by):
+    """Bets, hit rate (pushes excluded), ROI, mean probability and projection MAE per group."""
+    frame = bets.assign(win=bets['result'] == 'win', loss=bets['result'] == 'loss',
+                        abs_error=(bets['projected_value'] - bets['actual']).abs())
+    summary = frame.groupby(by, observed=True).agg(bets=('profit', 'size'), wins=('win', 'sum'), losses=('loss', 'sum'),
+                                                   profit=('profit', 'sum'), mean_probability=('probability', 'mean'),
+                                                   mae=('abs_error', 'mean'))
+    summary['hit_rate'] = summary['wins'] / (summary['wins'] + summary['losses']).replace(0, np.nan)
+    summary['roi'] = summary['profit'] / summary['bets']
+    summary['calibration_gap'] = summary['hit_rate'] - summary['mean_probability']
+    return summary.reset_index()
+
+def edge_buckets(bets, bounds=DEFAULT_EDGE_BUCKETS):
+    return pd.cut(bets['edge'], [-np.inf] + list(bounds) + [np.inf], right=False)
+
+def threshold_sweep(bets, thresholds=DEFAULT_THRESHOLDS):
+    """Bets, hit rate and ROI when betting only edges of at least each threshold, per
+    market and overall, from one sort and cumulative sums."""
+    rows = []
+    for market, group in [('all', bets)] + list(bets.groupby('market')):
+        order = np.argsort(-group['edge'].to_numpy(), kind='mergesort')
+        edge = group['edge'].to_numpy()[order]
+        profit = np.cumsum(group['profit'].to_numpy()[order])
+        wins = np.cumsum((group['result'] == 'win').to_numpy()[order])
+        losses = np.cumsum((group['result'] == 'loss').to_numpy()[order])
+        # Number of bets with edge >= threshold, as edge is sorted descending
+        counts = np.searchsorted(-edge, -np.asarray(thresholds, dtype=float), side='right')
+        for threshold, count in zip(thresholds, counts):
+            decided = (wins[count - 1] + losses[count - 1]) if count else 0
+            rows.append({
+                'market': market, 'min_edge': threshold, 'bets': int(count),
+                'hit_rate': wins[count - 1] / decided if decided else np.nan,
+                'roi': profit[count - 1] / count if count else np.nan
+            })
+    return pd.DataFrame(rows)
+
+def print_report(bets, by_bucket, calibration, sweep):
+    totals = summarize(bets.assign(all='all'), 'all').iloc[0]
+    print(f"Backtest: {len(bets)} bets on {bets['game_id'].nunique()} games "
+          f"({bets['start_date'].min().date()} to {bets['start_date'].max().date()})")
+    print(f"  Hit rate {totals['hit_rate']:.1%}, ROI {totals['roi']:+.1%}, projection MAE {totals['mae']:.2f}")
+
+    with_probability = bets['probability'].notna().any()
+    print("\nBy market and edge bucket")
+    print(f"  {'market':<26} {'edge':<12} {'bets':>7} {'hit rate':>9} {'ROI':>8}" + (f" {'prob':>7} {'gap':>7}" if with_probability else ''))
+    for row in by_bucket.itertuples(index=False):
+        print(f"  {row.market:<26} {str(row.edge_bucket):<12} {row.bets:>7} {row.hit_rate:>9.1%} {row.roi:>+8.1%}"
+              + (f" {row.mean_probability:>7.1%} {row.calibration_gap:>+7.1%}" if with_probability else ''))
+
+    if len(calibration):
+        print("\nCalibration by predicted probability")
+        for row in calibration.itertuples(index=False):
+            print(f"  {str(row.probability_bucket):<14} {row.bets:>7} bets  predicted {row.mean_probability:>6.1%}  actual {row.hit_rate:>6.1%}")
+
+    print("\nMinimum edge sweep")
+    for market, rows in sweep.groupby('market', sort=False):
+        cells = '  '.join(f">={row.min_edge:g}: {row.bets} bets {row.roi:+.1%}" for row in rows.itertuples(index=False) if row.bets)
+        print(f"  {market:<26} {cells}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Backtest recommended sides against stored odds snapshots')
+    parser.add_argument('--odds', type=str, nargs='+', default=[run_predictions.odds_snapshots_path], help='Odds snapshot CSVs written by run_predictions.py --odds_snapshots')
+    parser.add_argument('--data_dir', type=str, help='Read player_history.csv, fixtures.csv and player_teams.csv here instead of Supabase', required=False)
+    parser.add_argument('--synthetic', action='store_true', help='Backtest a generated league against synthetic closing lines instead')
+    parser.add_argument('--params', type=str, default=run_predictions.best_params_path, help='Parameter file to backtest (default: best_params.json)')
+    parser.add_argument('--from_date', type=str, help='Only games on or after this date', required=False)
+    parser.add_argument('--to_date', type=str, help='Only games before this date', required=False)
+    parser.add_argument('--markets', type=str, nargs='+', choices=list(MARKETS), help='Markets to backtest (default: all with lines)', required=False)
+    parser.add_argument('--edge_buckets', type=float, nargs='+', default=DEFAULT_EDGE_BUCKETS, help='Edge bucket boundaries, in stat units')
+    parser.add_argument('--thresholds', type=float, nargs='+', default=DEFAULT_THRESHOLDS, help='Minimum edges to sweep')
+    parser.add_argument('--resamples', type=int, default=DEFAULT_RESAMPLES, help='Bootstrap resamples per prop; 0 picks sides by edge and skips calibration')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the bootstrap and the synthetic league')
+    parser.add_argument('--bets_csv', type=str, help='Write every bet to this CSV', required=False)
+    parser.add_argument('--json', type=str, help='Write the bucket, calibration and sweep tables as JSON to this file', required=False)
+    parser.add_argument('--calibration_out', type=str, nargs='?', const=run_predictions.probability_calibration_path,
+                        help='Fit the error model on every backtested prop and write it for run_predictions.py '
+                             '(default: probability_calibration.json)', required=False)
+    add_logging_arguments(parser)
+    args = parser.parse_args(argv)
+    setup_from_args(args)
+
+    if args.synthetic:
+        from synthetic_league import generate_league, historical_lines
+        league = generate_league(seed=args.seed)
+        player_history, fixtures, player_teams = league['player_history'], league['fixtures'], league['player_teams']
+        snapshots = historical_lines(player_history, seed=args.seed)
+    else:
+        missing = [path for path in args.odds if not os.path.exists(path)]
+        if missing:
+            print(f"ERROR: No odds snapshots at {', '.join(missing)}")
+            print("Collect them with: python run_predictions.py --odds_snapshots")
+            sys.exit(1)
+        snapshots = load_snapshots(args.odds)
+        player_history, fixtures, player_teams = load_tables(args.data_dir)
+    fixtures['start_date'] = pd.to_datetime(fixtures['start_date'], utc=True)
+    player_history['start_date'] = pd.to_datetime(player_history['start_date'], utc=True)
+    history = run_predictions.enrich_data(player_history, fixtures, player_teams)['player_history']
+    all_params = run_predictions.read_best_params(args.params)
+
+    if args.markets:
+        snapshots = snapshots[snapshots['market'].isin(args.markets)]
+    games = fixtures.set_index('game_id')['start_date']
+    if args.from_date:
+        snapshots = snapshots[snapshots['game_id'].map(games) >= pd.Timestamp(args.from_date, tz='UTC')]
+    if args.to_date:
+        snapshots = snapshots[snapshots['game_id'].map(games) < pd.Timestamp(args.to_date, tz='UTC')]
+
+    started = time.perf_counter()
+    error_model = {} if args.calibration_out else None
+    bets = backtest(history, snapshots, all_params, resamples=args.resamples, seed=args.seed, error_model=error_model)
+    if bets.empty:
+        print("No props with both a closing line and a result to backtest")
+        sys.exit(1)
+    bets['edge_bucket'] = edge_buckets(bets, args.edge_buckets)
+    by_bucket = summarize(bets, ['market', 'edge_bucket'])
+    calibration = pd.DataFrame()
+    if args.resamples:
+        bets['probability_bucket'] = pd.cut(bets['probability'], PROBABILITY_BUCKETS, include_lowest=True)
+        calibration = summarize(bets, 'probability_bucket')
+    sweep = threshold_sweep(bets, args.thresholds)
+    elapsed = time.perf_counter() - started
+
+    print_report(bets, by_bucket, calibration, sweep)
+    print(f"\nBacktested {len(bets)} props from {len(snapshots)} snapshot lines in {elapsed:.2f}s")
+
+    if args.bets_csv:
+        bets.to_csv(args.bets_csv, index=False)
+    if args.json:
+        tables = {'by_market_edge': by_bucket, 'calibration': calibration, 'threshold_sweep': sweep}
+        with open(args.json, 'w') as f:
+            json.dump({name: json.loads(table.astype({column: str for column in table.columns if column.endswith('bucket')})
+                                        .to_json(orient='records')) for name, table in tables.items()}, f, indent=2)
+    if args.calibration_out:
+        with open(args.calibration_out, 'w') as f:
+            json.dump({'fit_at': datetime.now().isoformat(), 'params': all_params, 'props': len(bets), 'markets': error_model}, f)
+        print(f"Wrote the error model for {len(error_model)} markets to {args.calibration_out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import statistics
+import subprocess
+from datetime import datetime
+
+import pandas as pd
+import numpy as np
+
+import run_predictions
+from nba_prop_trainer import current_dir, best_params_path, enrich_player_history, predict_stat, split_train_test
+from odds_table import best_lines
+from prop_probability import bootstrap_props, error_rows, pack_windows
+from synthetic_league import build_league, odds_payload, upcoming_slate
+
+# Offline benchmarks on fixtures.csv/player_teams.csv plus synthetic history
+BENCHMARK_VERSION = 1
+DEFAULT_SCALES = [1, 5, 20]
+CASES = ['features_run_predictions', 'features_trainer', 'predict_slate', 'trainer_predict_stat', 'odds_parsing', 'prop_probabilities']
+STATS = ['points', 'assists', 'total_rebounds']
+# A slate of odds parses and picks best lines in a few hundred milliseconds, so each
+# run repeats it this many times
+ODDS_PARSE_LOOPS = 10
+default_results_path = os.path.join(current_dir, 'benchmark_results.json')
+
+def time_case(setup, fn, repeat, max_seconds):
+    """Time fn(setup()) up to repeat times, stopping early once max_seconds is spent."""
+    timings = []
+    spent = 0.0
+    while len(timings) < repeat and (not timings or spent < max_seconds):
+        arg = setup()
+        started = time.perf_counter()
+        fn(arg)
+        elapsed = time.perf_counter() - started
+        timings.append(elapsed)
+        spent += elapsed
+    return timings
+
+def prepare_prediction_data(player_history, fixtures, player_teams):
+    """Enrich the league and append an upcoming slate with every team playing once."""
+    data = run_predictions.enrich_data(player_history, fixtures.copy(), player_teams)
+    data['all_params'] = run_predictions.read_best_params()
+    data['error_model'] = run_predictions.fit_history_errors(data['player_history'], data['all_params'])
+    start_date = data['player_history']['start_date'].max() + pd.Timedelta(days=1)
+    games, slate_players = upcoming_slate(data['player_current_team'], data['latest_wins'], start_date)
+    data['fixtures'] = pd.concat([data['fixtures'], pd.DataFrame(games)], ignore_index=True)
+    return data, slate_players
+
+def predict_slate(slate_players, all_params):
+    count = 0
+    for game_id, player_ids in slate_players.items():
+        for player_id in player_ids:
+            for stat in STATS:
+                if isinstance(run_predictions.predict_player_stat(player_id, game_id, stat, all_params), float):
+                    count += 1
+    return count
+
+def slate_windows(slate_players, all_params):
+    """The weighted window and market of every slate prop, as collected by process_fixture."""
+    windows, markets = [], []
+    for game_id, player_ids in slate_players.items():
+        for player_id in player_ids:
+            player_windows = {}
+            run_predictions.predict_player_markets(player_id, game_id, STATS, all_params, windows=player_windows)
+            windows.extend(player_windows.values())
+            markets.extend(player_windows.keys())
+    return windows, markets
+
+def run_benchmarks(data_dir=current_dir, scales=DEFAULT_SCALES, cases=CASES, repeat=3, max_seconds=30.0, seed=0):
+    with open(best_params_path, 'r') as f:
+        trainer_params = json.load(f)['points']
+
+    results = []
+    for scale in scales:
+        player_history, fixtures, player_teams = build_league(data_dir, scale=scale, seed=seed)
+        print(f"\nScale {scale}x: {len(player_history)} history rows, {len(fixtures)} fixtures")
+        data, slate_players = prepare_prediction_data(player_history, fixtures, player_teams)
+        run_predictions.install_data(data)
+        payloads = [odds_payload(game_id, player_ids, seed=seed) for game_id, player_ids in slate_players.items()]
+        test_data = None
+
+        for case in cases:
+            if case == 'features_run_predictions':
+                items = len(player_history)
+                timings = time_case(lambda: (player_history.copy(), fixtures.copy(), player_teams),
+                                    lambda args: run_predictions.enrich_data(*args), repeat, max_seconds)
+            elif case == 'features_trainer':
+                items = len(player_history)
+                timings = time_case(lambda: (player_history.copy(), fixtures.copy(), player_teams),
+                                    lambda args: enrich_player_history(*args), repeat, max_seconds)
+            elif case == 'predict_slate':
+                items = sum(len(players) for players in slate_players.values()) * len(STATS)
+                timings = time_case(lambda: None, lambda _: predict_slate(slate_players, run_predictions.all_params),
+                                    repeat, max_seconds)
+            elif case == 'trainer_predict_stat':
+                if test_data is None:
+                    train_data, test_data = split_train_test(enrich_player_history(player_history, fixtures.copy(), player_teams))
+                items = len(test_data)
+                timings = time_case(lambda: None, lambda _: predict_stat(
+                    test_data, 'points', trainer_params['N'], trainer_params['decay_factor'],
+                    trainer_params['home_advantage'], trainer_params.get('opponent_weight', 1.0)), repeat, max_seconds)
+            elif case == 'odds_parsing':
+                items = sum(len(p['data'][0]['odds']) for p in payloads) * ODDS_PARSE_LOOPS
+                timings = time_case(lambda: None, lambda _: [best_lines(run_predictions.parse_optic_odds(p, p['data'][0]['game_id'])[1])
+                                                             for _ in range(ODDS_PARSE_LOOPS) for p in payloads],
+                                    repeat, max_seconds)
+            elif case == 'prop_probabilities':
+                windows, markets = slate_windows(slate_players, run_predictions.all_params)
+                errors = error_rows(run_predictions.error_model, np.array(markets))
+                lines = np.array([sum(np.average(v, weights=w) * f for v, w, f in stats) for stats in windows]).round() + 0.5
+                items = len(windows)
+                timings = time_case(lambda: None, lambda _: bootstrap_props(*pack_windows(windows), lines, lines, errors=errors),
+                                    repeat, max_seconds)
+            else:
+                raise ValueError(f"Unknown benchmark case: {case}")
+
+            median = statistics.median(timings)
+            results.append({
+                'case': case,
+                'scale': scale,
+                'items': items,
+                'runs': len(timings),
+                'min_seconds': round(min(timings), 6),
+                'median_seconds': round(median, 6),
+                'max_seconds': round(max(timings), 6),
+                'median_us_per_item': round(median / max(items, 1) * 1e6, 3)
+            })
+            print(f"  {case:<26} {median:>10.4f}s median over {len(timings)} runs ({items} items)")
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=current_dir, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare_results(results, baseline, max_regression):
+    """Return (case, scale, ratio) for every case whose median grew by more than max_regression."""
+    previous = {(r['case'], r['scale']): r for r in baseline['results']}
+    regressions = []
+    print(f"\nCompared with {baseline.get('git_commit') or 'baseline'} ({baseline.get('created_at')}):")
+    for result in results:
+        before = previous.get((result['case'], result['scale']))
+        if before is None:
+            continue
+        ratio = result['median_seconds'] / max(before['median_seconds'], 1e-9)
+        flag = ' REGRESSION' if ratio > max_regression else ''
+        print(f"  {result['case']:<26} {result['scale']:>3}x {before['median_seconds']:>10.4f}s -> {result['median_seconds']:>10.4f}s ({ratio:.2f}x){flag}")
+        if ratio > max_regression:
+            regressions.append((result['case'], result['scale'], ratio))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmarks for feature building, prediction, training and odds parsing')
+    parser.add_argument('--data_dir', type=str, default=current_dir, help='Directory containing fixtures.csv and player_teams.csv')
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES, help='Season multiples of synthetic history to benchmark')
+    parser.add_argument('--cases', choices=CASES, nargs='+', default=CASES, help='Benchmarks to run')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per case')
+    parser.add_argument('--max_seconds', type=float, default=30.0, help='Stop repeating a case after this many seconds')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the synthetic history')
+    parser.add_argument('--out', type=str, default=default_results_path, help='Where to write the JSON results')
+    parser.add_argument('--compare', type=str, help='Earlier results file to compare against', required=False)
+    parser.add_argument('--max_regression', type=float, default=1.25, help='With --compare, exit 1 if a median grows by more than this factor')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.data_dir, scales=args.scales, cases=args.cases, repeat=args.repeat,
+                             max_seconds=args.max_seconds, seed=args.seed)
+    report = {
+        'version': BENCHMARK_VERSION,
+        'created_at': datetime.now().isoformat(),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'seed': args.seed,
+        'results': results
+    }
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved benchmark results to {args.out}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        if baseline.get('version') != BENCHMARK_VERSION:
+            print(f"ERROR: Baseline version {baseline.get('version')} does not match {BENCHMARK_VERSION}")
+            sys.exit(1)
+        if compare_results(results, baseline, args.max_regression):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
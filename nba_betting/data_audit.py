@@ -0,0 +1,219 @@
+import ast
+import json
+import os
+import sys
+import time
+import argparse
+
+import pandas as pd
+
+import run_predictions
+from run_logging import add_logging_arguments, setup_from_args
+
+# League-wide data-quality audit of the tables behind run_predictions.py: what
+# each join drops, which players are missing where, ID case collisions, stale
+# histories and stat coverage, computed with merges and groupbys over all players.
+DEFAULT_STALE_DAYS = 14
+AUDIT_STATS = ['points', 'assists', 'total_rebounds', 'three_point_field_goals_made', 'steals', 'blocks']
+
+def _first_team_id(competitors):
+    if isinstance(competitors, str):
+        try:
+            competitors = json.loads(competitors)
+        except ValueError:
+            try:
+                competitors = ast.literal_eval(competitors)
+            except (ValueError, SyntaxError):
+                return None
+    try:
+        return competitors[0]['id']
+    except (TypeError, IndexError, KeyError):
+        return None
+
+def audit(player_history, fixtures, player_teams, stats=None, window=None, as_of=None, stale_days=DEFAULT_STALE_DAYS):
+    """Return (summary dict, one row per player) for the three raw tables."""
+    stats = [s for s in (stats or AUDIT_STATS) if s in player_history.columns]
+    history = player_history[['player_id', 'game_id', 'start_date'] + stats].copy()
+    history['start_date'] = pd.to_datetime(history['start_date'], utc=True)
+    teams = player_teams[['player_id', 'game_id', 'team_id']]
+    fixtures = fixtures[['game_id', 'start_date', 'home_competitors', 'away_competitors', 'home_score_total', 'away_score_total']].copy()
+    fixtures['start_date'] = pd.to_datetime(fixtures['start_date'], utc=True)
+    fixtures['home_team_id'] = fixtures['home_competitors'].map(_first_team_id)
+    fixtures['away_team_id'] = fixtures['away_competitors'].map(_first_team_id)
+    as_of = pd.Timestamp(as_of, tz='UTC') if as_of else fixtures['start_date'].max()
+
+    # history x player_teams: the inner merge in enrich_data drops unmatched rows
+    # and repeats rows whose (player_id, game_id) appears twice in player_teams
+    team_keys = teams.groupby(['player_id', 'game_id']).size().rename('team_matches').reset_index()
+    history = history.merge(team_keys, on=['player_id', 'game_id'], how='left')
+    history['lost_team_join'] = history['team_matches'].isna()
+    upper_keys = team_keys.assign(player_id=team_keys['player_id'].str.upper())[['player_id', 'game_id']].drop_duplicates()
+    history['case_recoverable'] = history['lost_team_join'] & pd.MultiIndex.from_arrays(
+        [history['player_id'].str.upper(), history['game_id']]).isin(pd.MultiIndex.from_frame(upper_keys))
+    history['without_fixture'] = ~history['game_id'].isin(fixtures['game_id'])
+    history['duplicate'] = history.duplicated(['player_id', 'game_id'])
+    for stat in stats:
+        history[f'{stat}_coverage'] = history[stat].notna()
+
+    # player_teams x fixtures: a team_id that is neither side of the fixture makes the
+    # player look like the away team in enrich_data
+    teams = teams.merge(fixtures[['game_id', 'start_date', 'home_team_id', 'away_team_id']], on='game_id', how='left')
+    teams['without_fixture'] = teams['start_date'].isna()
+    teams['team_not_in_fixture'] = ~teams['without_fixture'] & (teams['team_id'] != teams['home_team_id']) & (teams['team_id'] != teams['away_team_id'])
+
+    per_player = history.groupby('player_id').agg(
+        history_rows=('game_id', 'size'),
+        rows_lost_team_join=('lost_team_join', 'sum'),
+        rows_case_recoverable=('case_recoverable', 'sum'),
+        rows_without_fixture=('without_fixture', 'sum'),
+        duplicate_rows=('duplicate', 'sum'),
+        last_game=('start_date', 'max'),
+        **{f'{stat}_coverage': (f'{stat}_coverage', 'mean') for stat in stats}
+    )
+    team_per_player = teams.groupby('player_id').agg(
+        team_rows=('game_id', 'size'),
+        team_rows_without_fixture=('without_fixture', 'sum'),
+        team_not_in_fixture=('team_not_in_fixture', 'sum'),
+        last_team_game=('start_date', 'max')
+    )
+    players = per_player.join(team_per_player, how='outer')
+    count_columns = ['history_rows', 'rows_lost_team_join', 'rows_case_recoverable', 'rows_without_fixture', 'duplicate_rows',
+                     'team_rows', 'team_rows_without_fixture', 'team_not_in_fixture']
+    players[count_columns] = players[count_columns].fillna(0).astype(int)
+    players['days_since_last_game'] = (as_of - players['last_game']).dt.days
+    players['stale'] = players['days_since_last_game'] > stale_days
+    # A later game in player_teams than in player_history means the history load is behind
+    players['history_behind_teams'] = players['last_team_game'] > players['last_game']
+
+    upper = players.index.to_series().str.upper()
+    players['case_collision'] = upper.map(upper.value_counts()) > 1
+    if window:
+        players['short_history'] = players['history_rows'] - players['rows_lost_team_join'] < window
+    players = players.reset_index().rename(columns={'index': 'player_id'})
+
+    history_ids = set(per_player.index)
+    team_ids = set(team_per_player.index)
+    inner_rows = int(history['team_matches'].fillna(0).sum())
+    summary = {
+        'as_of': as_of.isoformat(),
+        'rows': {'player_history': len(player_history), 'fixtures': len(fixtures), 'player_teams': len(player_teams)},
+        'joins': {
+            'history_team_join': {
+                'rows_in': len(history),
+                'rows_out': inner_rows,
+                'rows_lost': int(history['lost_team_join'].sum()),
+                'rows_case_recoverable': int(history['case_recoverable'].sum()),
+                'rows_duplicated': inner_rows - int((~history['lost_team_join']).sum())
+            },
+            'history_fixture_join': {'rows_lost': int(history['without_fixture'].sum())},
+            'team_fixture_join': {
+                'rows_lost': int(teams['without_fixture'].sum()),
+                'team_not_in_fixture': int(teams['team_not_in_fixture'].sum())
+            },
+            'fixtures_unparsed_teams': int((fixtures['home_team_id'].isna() | fixtures['away_team_id'].isna()).sum()),
+            'fixtures_without_score': int((fixtures['home_score_total'].isna() | fixtures['away_score_total'].isna()).sum())
+        },
+        'players': {
+            'total': len(players),
+            'history_only': len(history_ids - team_ids),
+            'player_teams_only': len(team_ids - history_ids),
+            'case_collisions': int(players['case_collision'].sum()),
+            'stale': int(players['stale'].sum()),
+            'history_behind_teams': int(players['history_behind_teams'].sum()),
+            'short_history': int(players['short_history'].sum()) if window else None
+        },
+        'duplicate_keys': {
+            'player_history': int(history['duplicate'].sum()),
+            'player_teams': int(player_teams.duplicated(['player_id', 'game_id']).sum())
+        },
+        'stat_coverage': {stat: round(float(history[stat].notna().mean()), 4) for stat in stats},
+        'stale_days': stale_days,
+        'window': window
+    }
+    return summary, players
+
+def print_report(summary, players, top=10):
+    joins = summary['joins']
+    team_join = joins['history_team_join']
+    print(f"Data audit as of {summary['as_of']}")
+    print("  Rows: " + ', '.join(f"{table} {count}" for table, count in summary['rows'].items()))
+    print("\nJoins")
+    print(f"  player_history x player_teams: {team_join['rows_in']} -> {team_join['rows_out']} rows "
+          f"({team_join['rows_lost']} lost, {team_join['rows_case_recoverable']} recoverable by ID case, "
+          f"{team_join['rows_duplicated']} duplicated)")
+    print(f"  player_history rows without a fixture: {joins['history_fixture_join']['rows_lost']}")
+    print(f"  player_teams rows without a fixture: {joins['team_fixture_join']['rows_lost']}, "
+          f"team not playing in the fixture: {joins['team_fixture_join']['team_not_in_fixture']}")
+    print(f"  fixtures with unparsed teams: {joins['fixtures_unparsed_teams']}, without a final score: {joins['fixtures_without_score']}")
+
+    counts = summary['players']
+    print("\nPlayers")
+    print(f"  {counts['total']} players, {counts['history_only']} only in player_history, {counts['player_teams_only']} only in player_teams")
+    print(f"  {counts['case_collisions']} in ID case collisions, {counts['stale']} with no game in {summary['stale_days']} days, "
+          f"{counts['history_behind_teams']} with player_teams ahead of player_history")
+    if summary['window']:
+        print(f"  {counts['short_history']} with fewer than {summary['window']} usable games")
+    print("  Duplicate (player_id, game_id) keys: " + ', '.join(f"{table} {count}" for table, count in summary['duplicate_keys'].items()))
+
+    print("\nStat coverage")
+    for stat, coverage in summary['stat_coverage'].items():
+        print(f"  {stat:<32} {coverage:>7.1%}")
+
+    for title, mask, column in [
+        ('Most rows lost in the player_teams join', players['rows_lost_team_join'] > 0, 'rows_lost_team_join'),
+        ('ID case collisions', players['case_collision'], 'history_rows'),
+        ('Stalest players', players['stale'], 'days_since_last_game'),
+    ]:
+        rows = players[mask].sort_values(column, ascending=False).head(top)
+        if len(rows):
+            print(f"\n{title}")
+            for _, row in rows.iterrows():
+                last_game = row['last_game'].date() if pd.notna(row['last_game']) else 'never'
+                print(f"  {row['player_id']:<16} {column}={row[column]}  history_rows={row['history_rows']}  last_game={last_game}")
+
+def load_tables(data_dir=None):
+    if data_dir:
+        player_history = pd.read_csv(os.path.join(data_dir, 'player_history.csv'))
+        fixtures = pd.read_csv(os.path.join(data_dir, 'fixtures.csv'))
+        player_teams = pd.read_csv(os.path.join(data_dir, 'player_teams.csv'))
+    else:
+        player_history = run_predictions.fetch_player_history()
+        fixtures = run_predictions.fetch_fixtures()
+        player_teams = run_predictions.fetch_player_teams()
+    return player_history, fixtures, player_teams
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='League-wide data-quality audit of player_history, fixtures and player_teams')
+    parser.add_argument('--data_dir', type=str, help='Audit player_history.csv, fixtures.csv and player_teams.csv here instead of Supabase', required=False)
+    parser.add_argument('--as_of', type=str, help='Date staleness is measured from (default: the latest fixture)', required=False)
+    parser.add_argument('--stale_days', type=int, default=DEFAULT_STALE_DAYS, help='Flag players with no game in this many days')
+    parser.add_argument('--top', type=int, default=10, help='Players listed per section')
+    parser.add_argument('--json', type=str, help='Write the summary as JSON to this file', required=False)
+    parser.add_argument('--players_csv', type=str, help='Write the per-player audit to this CSV', required=False)
+    parser.add_argument('--max_lost_fraction', type=float, help='Exit 1 if the player_teams join loses more than this fraction of rows', required=False)
+    add_logging_arguments(parser)
+    args = parser.parse_args(argv)
+    setup_from_args(args)
+
+    player_history, fixtures, player_teams = load_tables(args.data_dir)
+    with open(run_predictions.best_params_path, 'r') as f:
+        window = max(params['N'] for params in json.load(f).values())
+    started = time.perf_counter()
+    summary, players = audit(player_history, fixtures, player_teams, window=window, as_of=args.as_of, stale_days=args.stale_days)
+    elapsed = time.perf_counter() - started
+    print_report(summary, players, top=args.top)
+    print(f"\nAudited {len(player_history)} history rows for {len(players)} players in {elapsed:.2f}s")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+    if args.players_csv:
+        players.to_csv(args.players_csv, index=False)
+
+    lost = summary['joins']['history_team_join']
+    if args.max_lost_fraction is not None and lost['rows_lost'] > args.max_lost_fraction * max(lost['rows_in'], 1):
+        print(f"ERROR: The player_teams join loses {lost['rows_lost']} of {lost['rows_in']} rows")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,471 @@
+import csv
+import json
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from synthetic_league import generate_league
+
+# Local stand-ins for Supabase (PostgREST) and the Optic Odds API, serving a
+# synthetic league with configurable latency, errors and rate limits so a whole
+# prediction run can be measured on one machine. Point the scripts at it with
+#   NEXT_PUBLIC_SUPABASE_URL=http://127.0.0.1:54321
+#   OPTIC_API_URL=http://127.0.0.1:54321/api/v3
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 54321
+DEFAULT_MAX_ROWS = 1000
+SERVICES = ['supabase', 'optic']
+# Query parameters PostgREST treats as options rather than column filters
+RESERVED_PARAMS = {'select', 'order', 'offset', 'limit', 'on_conflict', 'columns'}
+
+class FaultConfig:
+    """Latency, random errors and a token-bucket rate limit for one service."""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, rate_limit=0.0, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.tokens = rate_limit
+        self.refilled_at = time.monotonic()
+
+    def _take_token(self):
+        with self.lock:
+            now = time.monotonic()
+            # Burst of up to one second's worth of requests
+            self.tokens = min(self.rate_limit, self.tokens + (now - self.refilled_at) * self.rate_limit)
+            self.refilled_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return None
+            return (1 - self.tokens) / self.rate_limit
+
+    def apply(self):
+        """Sleep for the configured latency; return 'rate_limited', 'error' or None."""
+        if self.rate_limit > 0:
+            wait = self._take_token()
+            if wait is not None:
+                return 'rate_limited', wait
+        with self.lock:
+            delay = self.latency_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms)
+            failed = self.rng.random() < self.error_rate
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+        return ('error', None) if failed else (None, None)
+
+class FakeTable:
+    """A table held as a DataFrame for filtering, switched to row dicts once written to."""
+
+    def __init__(self, frame):
+        self._frame = frame
+        self._rows = None
+        # Serial id like a Postgres identity column, for tables that have one
+        self.has_id = 'id' in frame.columns
+        self._next_id = 1
+        self._indexes = {}
+
+    def frame(self):
+        if self._frame is None:
+            self._frame = pd.DataFrame(self._rows)
+        return self._frame
+
+    def _index(self, conflict_columns):
+        if conflict_columns not in self._indexes:
+            self._indexes[conflict_columns] = {tuple(row.get(c) for c in conflict_columns): i for i, row in enumerate(self._rows)}
+        return self._indexes[conflict_columns]
+
+    def upsert(self, rows, conflict_columns, merge):
+        if self._rows is None:
+            self._rows = self._frame.to_dict('records')
+            if self.has_id and len(self._frame) and pd.api.types.is_numeric_dtype(self._frame['id']):
+                self._next_id = int(self._frame['id'].max()) + 1
+        self._frame = None
+        conflict_columns = tuple(conflict_columns)
+        index = self._index(conflict_columns) if merge else None
+        written = []
+        for row in rows:
+            row = dict(row)
+            key = tuple(row.get(c) for c in conflict_columns)
+            if merge and None not in key and key in index:
+                self._rows[index[key]].update(row)
+                written.append(self._rows[index[key]])
+                continue
+            if self.has_id and row.get('id') is None:
+                row['id'] = self._next_id
+                self._next_id += 1
+            row.setdefault('created_at', datetime.now(timezone.utc).isoformat())
+            self._rows.append(row)
+            for columns, other in self._indexes.items():
+                other[tuple(row.get(c) for c in columns)] = len(self._rows) - 1
+            written.append(row)
+        return written
+
+class FakeBackend:
+    def __init__(self, league, faults, max_rows=DEFAULT_MAX_ROWS, api_key=None):
+        self.tables = {
+            'player_history': FakeTable(league['player_history']),
+            'fixtures_completed': FakeTable(league['fixtures']),
+            'player_teams': FakeTable(league['player_teams']),
+            'custom_projections': FakeTable(pd.DataFrame(columns=[
+                'id', 'player_id', 'player_name', 'stat_type', 'line', 'projected_value', 'confidence',
+                'recommendation', 'edge', 'metadata', 'created_at']))
+        }
+        self.upcoming = league['upcoming']
+        self.odds = league['odds']
+        self.faults = faults
+        self.max_rows = max_rows
+        self.api_key = api_key
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.counts = {}
+        self.rows_served = 0
+        self.rows_written = 0
+
+    def record(self, service, status, rows=0, written=0):
+        with self.lock:
+            key = f"{service} {status}"
+            self.counts[key] = self.counts.get(key, 0) + 1
+            self.rows_served += rows
+            self.rows_written += written
+
+    def stats(self):
+        with self.lock:
+            uptime = time.time() - self.started_at
+            total = sum(self.counts.values())
+            return {
+                'uptime_seconds': round(uptime, 3),
+                'requests': dict(sorted(self.counts.items())),
+                'requests_per_second': round(total / max(uptime, 1e-9), 2),
+                'rows_served': self.rows_served,
+                'rows_written': self.rows_written,
+                'table_rows': {name: len(table.frame()) for name, table in self.tables.items()}
+            }
+
+    def reset(self):
+        with self.lock:
+            self.tables['custom_projections'] = FakeTable(self.tables['custom_projections'].frame().iloc[0:0])
+            self.started_at = time.time()
+            self.counts = {}
+            self.rows_served = 0
+            self.rows_written = 0
+
+def _coerce(series, value):
+    """Convert a filter value to the column's type so comparisons behave like Postgres."""
+    if value is None:
+        return None
+    if pd.api.types.is_datetime64_any_dtype(series):
+        ts = pd.Timestamp(value)
+        if series.dt.tz is not None and ts.tzinfo is None:
+            ts = ts.tz_localize('UTC')
+        return ts
+    if pd.api.types.is_bool_dtype(series):
+        return value.lower() == 'true'
+    if pd.api.types.is_numeric_dtype(series):
+        return float(value)
+    return value
+
+def parse_in_list(value):
+    """in.(a,b,"c,d") -> ['a', 'b', 'c,d']"""
+    inner = value[1:-1] if value.startswith('(') and value.endswith(')') else value
+    return next(csv.reader([inner], quotechar='"', skipinitialspace=True), [])
+
+def apply_filter(frame, column, expression):
+    if column not in frame.columns:
+        raise ValueError(f'column {column} does not exist')
+    negate = expression.startswith('not.')
+    if negate:
+        expression = expression[4:]
+    op, _, value = expression.partition('.')
+    series = frame[column]
+    if op == 'in':
+        values = parse_in_list(value)
+        if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            mask = series.astype(str).isin(values)
+        else:
+            mask = series.isin([_coerce(series, v) for v in values])
+    elif op == 'is':
+        mask = series.isna() if value == 'null' else series == (value == 'true')
+    elif op in ('eq', 'neq', 'gt', 'gte', 'lt', 'lte'):
+        target = _coerce(series, value)
+        mask = {'eq': series == target, 'neq': series != target, 'gt': series > target,
+                'gte': series >= target, 'lt': series < target, 'lte': series <= target}[op]
+    else:
+        raise ValueError(f'unsupported operator {op}')
+    return frame[~mask if negate else mask]
+
+def parse_range(headers, params):
+    """(offset, limit) from a Range header or offset/limit parameters, as postgrest clients send either."""
+    offset, limit = 0, None
+    range_header = headers.get('Range')
+    if range_header and '-' in range_header:
+        start, _, end = range_header.partition('-')
+        offset = int(start)
+        if end:
+            limit = int(end) - offset + 1
+    if 'offset' in params:
+        offset = int(params['offset'][0])
+    if 'limit' in params:
+        limit = int(params['limit'][0])
+    return offset, limit
+
+def select_rows(backend, table, params, headers):
+    """Return (JSON body, content_range, row_count) for a PostgREST GET."""
+    frame = backend.tables[table].frame()
+    for column, values in params.items():
+        if column in RESERVED_PARAMS:
+            continue
+        for expression in values:
+            frame = apply_filter(frame, column, expression)
+
+    if 'order' in params:
+        columns, ascending = [], []
+        for term in params['order'][0].split(','):
+            parts = term.split('.')
+            columns.append(parts[0])
+            ascending.append('desc' not in parts[1:])
+        frame = frame.sort_values(columns, ascending=ascending, kind='mergesort')
+
+    select = params.get('select', ['*'])[0]
+    total = len(frame)
+    if select.replace(' ', '') == 'count(*)':
+        return json.dumps([{'count': total}]), f"0-0/{total}", 1
+
+    offset, limit = parse_range(headers, params)
+    limit = backend.max_rows if limit is None else min(limit, backend.max_rows)
+    page = frame.iloc[offset:offset + limit]
+    if select != '*':
+        page = page[[c.strip() for c in select.split(',')]]
+    exact = 'count=exact' in headers.get('Prefer', '')
+    content_range = f"{offset}-{offset + len(page) - 1}" if len(page) else '*'
+    content_range += f"/{total}" if exact else '/*'
+    return page.to_json(orient='records', date_format='iso'), content_range, len(page)
+
+class FakeServiceHandler(BaseHTTPRequestHandler):
+    backend = None
+    quiet = True
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+    def _send(self, status, body, headers=None):
+        if not isinstance(body, (bytes, str)):
+            body = json.dumps(body, default=str)
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        """Read the whole request body before replying: closing the socket with bytes
+        still unread makes the kernel send a RST (postgrest sends {} with every GET)."""
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _route(self):
+        parts = urlsplit(self.path)
+        params = parse_qs(parts.query, keep_blank_values=True)
+        path = parts.path.rstrip('/')
+        if path.startswith('/rest/v1/'):
+            return 'supabase', path[len('/rest/v1/'):], params
+        if path.startswith('/api/v3/'):
+            return 'optic', path[len('/api/v3/'):], params
+        return None, path, params
+
+    def _inject_faults(self, service):
+        outcome, retry_after = self.backend.faults[service].apply()
+        if outcome == 'rate_limited':
+            self.backend.record(service, 429)
+            self._send(429, {'message': 'API rate limit exceeded'}, {'Retry-After': str(max(1, round(retry_after)))})
+            return True
+        if outcome == 'error':
+            self.backend.record(service, 503)
+            payload = {'code': 'PGRST000', 'message': 'Injected failure', 'details': None, 'hint': None} \
+                if service == 'supabase' else {'message': 'Injected failure'}
+            self._send(503, payload)
+            return True
+        return False
+
+    def do_GET(self):
+        self._read_body()
+        service, resource, params = self._route()
+        if service is None:
+            if resource == '/_fake/stats':
+                self._send(200, self.backend.stats())
+            else:
+                self._send(404, {'message': f'Unknown endpoint {resource}'})
+            return
+        if self._inject_faults(service):
+            return
+        if service == 'supabase':
+            self._get_table(resource, params)
+        else:
+            self._get_optic(resource, params)
+
+    def do_POST(self):
+        body = self._read_body()
+        service, resource, params = self._route()
+        if service is None and resource == '/_fake/reset':
+            self.backend.reset()
+            self._send(200, {'success': True})
+            return
+        if service != 'supabase':
+            self._send(404, {'message': f'Unknown endpoint {resource}'})
+            return
+        if self._inject_faults(service):
+            return
+        self._post_table(resource, params, body)
+
+    def _get_table(self, table, params):
+        if table not in self.backend.tables:
+            self.backend.record('supabase', 404)
+            self._send(404, {'code': '42P01', 'message': f'relation "public.{table}" does not exist', 'details': None, 'hint': None})
+            return
+        try:
+            body, content_range, rows = select_rows(self.backend, table, params, self.headers)
+        except (ValueError, KeyError) as e:
+            self.backend.record('supabase', 400)
+            self._send(400, {'code': 'PGRST100', 'message': str(e), 'details': None, 'hint': None})
+            return
+        self.backend.record('supabase', 200, rows=rows)
+        self._send(200, body, {'Content-Range': content_range})
+
+    def _post_table(self, table, params, body):
+        if table not in self.backend.tables:
+            self.backend.record('supabase', 404)
+            self._send(404, {'code': '42P01', 'message': f'relation "public.{table}" does not exist', 'details': None, 'hint': None})
+            return
+        try:
+            payload = json.loads(body.decode('utf-8')) if body else None
+        except ValueError as e:
+            self.backend.record('supabase', 400)
+            self._send(400, {'code': 'PGRST102', 'message': f'Invalid JSON body: {e}', 'details': None, 'hint': None})
+            return
+        rows = payload if isinstance(payload, list) else [payload or {}]
+        prefer = self.headers.get('Prefer', '')
+        conflict_columns = params.get('on_conflict', ['id'])[0].split(',')
+        with self.backend.lock:
+            written = self.backend.tables[table].upsert(rows, conflict_columns, merge='resolution=merge-duplicates' in prefer)
+        self.backend.record('supabase', 201, written=len(written))
+        if 'return=representation' in prefer:
+            self._send(201, written)
+        else:
+            self._send(201, b'')
+
+    def _get_optic(self, resource, params):
+        if self.backend.api_key and params.get('key', [None])[0] != self.backend.api_key:
+            self.backend.record('optic', 401)
+            self._send(401, {'message': 'Invalid API key'})
+            return
+        if resource == 'fixtures/active':
+            fixture_ids = set(params.get('fixture_id', []))
+            data = [f for f in self.backend.upcoming if not fixture_ids or f['id'] in fixture_ids]
+            self.backend.record('optic', 200, rows=len(data))
+            self._send(200, {'data': data})
+        elif resource == 'fixtures/odds':
+            markets = {m.lower() for m in params.get('market', [])}
+            sportsbooks = {s.lower() for s in params.get('sportsbook', [])}
+            main_only = params.get('is_main', ['false'])[0].lower() == 'true'
+            fixtures_by_id = {f['id']: f for f in self.backend.upcoming}
+            data, rows = [], 0
+            for fixture_id in params.get('fixture_id', []):
+                if fixture_id not in self.backend.odds:
+                    continue
+                odds = [o for o in self.backend.odds[fixture_id]['odds']
+                        if (not markets or o['market'].lower() in markets)
+                        and (not sportsbooks or o['sportsbook'].lower() in sportsbooks)
+                        and (not main_only or o.get('is_main'))]
+                rows += len(odds)
+                data.append({**fixtures_by_id.get(fixture_id, {}), **self.backend.odds[fixture_id], 'odds': odds})
+            self.backend.record('optic', 200, rows=rows)
+            self._send(200, {'data': data})
+        else:
+            self.backend.record('optic', 404)
+            self._send(404, {'message': f'Unknown endpoint /api/v3/{resource}'})
+
+def load_league_csvs(data_dir):
+    """Serve exported player_history.csv/fixtures.csv/player_teams.csv instead of a generated league."""
+    player_history = pd.read_csv(os.path.join(data_dir, 'player_history.csv'), parse_dates=['start_date'])
+    fixtures = pd.read_csv(os.path.join(data_dir, 'fixtures.csv'), parse_dates=['start_date'])
+    player_teams = pd.read_csv(os.path.join(data_dir, 'player_teams.csv'))
+    return {'player_history': player_history, 'fixtures': fixtures, 'player_teams': player_teams, 'upcoming': [], 'odds': {}}
+
+def create_server(backend, host=DEFAULT_HOST, port=DEFAULT_PORT, quiet=True):
+    handler = type('BoundFakeServiceHandler', (FakeServiceHandler,), {'backend': backend, 'quiet': quiet})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fake Supabase and Optic Odds services for local end-to-end runs')
+    parser.add_argument('--host', type=str, default=DEFAULT_HOST, help='Interface to bind the HTTP server to')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='Port for the HTTP server')
+    parser.add_argument('--data_dir', type=str, help='Serve player_history.csv, fixtures.csv and player_teams.csv from here instead of a generated league', required=False)
+    parser.add_argument('--teams', type=int, default=30, help='Teams in the generated league')
+    parser.add_argument('--players_per_team', type=int, default=12, help='Roster size in the generated league')
+    parser.add_argument('--seasons', type=int, default=1, help='Seasons of history in the generated league')
+    parser.add_argument('--upcoming_games', type=int, help='Fixtures in the upcoming slate (default: every team plays)', required=False)
+    parser.add_argument('--tip_off_hours', type=float, help='Start the upcoming slate this many hours from now, one fixture every 30 minutes (default: the day after the last season)', required=False)
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the league and the fault injection')
+    parser.add_argument('--max_rows', type=int, default=DEFAULT_MAX_ROWS, help='Most rows one PostgREST response returns')
+    parser.add_argument('--api_key', type=str, help='Reject Optic requests without this key', required=False)
+    for service in SERVICES:
+        parser.add_argument(f'--{service}_latency_ms', type=float, default=0.0, help=f'Added latency per {service} request')
+        parser.add_argument(f'--{service}_jitter_ms', type=float, default=0.0, help=f'Uniform +/- jitter on the {service} latency')
+        parser.add_argument(f'--{service}_error_rate', type=float, default=0.0, help=f'Fraction of {service} requests answered with a 503')
+        parser.add_argument(f'--{service}_rate_limit', type=float, default=0.0, help=f'{service} requests per second before 429s (0 disables it)')
+    parser.add_argument('--log_requests', action='store_true', help='Log every request to stderr')
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    if args.data_dir:
+        league = load_league_csvs(args.data_dir)
+    else:
+        league = generate_league(n_teams=args.teams, players_per_team=args.players_per_team, seasons=args.seasons,
+                                 upcoming_games=args.upcoming_games, seed=args.seed)
+    if args.tip_off_hours is not None:
+        first = datetime.now(timezone.utc) + timedelta(hours=args.tip_off_hours)
+        for i, fixture in enumerate(league['upcoming']):
+            fixture['start_date'] = (first + timedelta(minutes=30 * i)).strftime('%Y-%m-%dT%H:%M:%SZ')
+    faults = {service: FaultConfig(getattr(args, f'{service}_latency_ms'), getattr(args, f'{service}_jitter_ms'),
+                                   getattr(args, f'{service}_error_rate'), getattr(args, f'{service}_rate_limit'),
+                                   seed=args.seed + i)
+              for i, service in enumerate(SERVICES)}
+    backend = FakeBackend(league, faults, max_rows=args.max_rows, api_key=args.api_key)
+    print(f"Loaded {len(league['player_history'])} history rows, {len(league['fixtures'])} fixtures and "
+          f"{len(league['upcoming'])} upcoming games in {time.perf_counter() - started:.1f}s")
+
+    try:
+        server = create_server(backend, host=args.host, port=args.port, quiet=not args.log_requests)
+    except OSError as e:
+        print(f"ERROR: Could not bind {args.host}:{args.port}: {e}")
+        sys.exit(1)
+    base = f"http://{args.host}:{args.port}"
+    print(f"Fake services listening on {base}")
+    print(f"  NEXT_PUBLIC_SUPABASE_URL={base}")
+    print(f"  OPTIC_API_URL={base}/api/v3")
+    print(f"  Stats: GET {base}/_fake/stats, reset: POST {base}/_fake/reset")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Shutting down fake services")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
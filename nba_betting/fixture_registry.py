@@ -0,0 +1,51 @@
+# Games run_predictions.py can predict, keyed by game_id. Each entry holds what
+# predict_player_markets needs about the target game, resolved once when the
+# game is added: its start date, the home and away team IDs and both teams'
+# win percentages before it. Entries are plain dicts that are never changed
+# after they are added, so every prediction path can share them.
+DEFAULT_STRENGTH = 0.5
+FIELDS = ['game_id', 'start_date', 'home_team_id', 'away_team_id',
+          'home_team_win_percentage_before', 'away_team_win_percentage_before']
+
+class FixtureRegistry:
+    def __init__(self):
+        self.entries = {}
+
+    @classmethod
+    def from_frame(cls, fixtures):
+        """A registry of an enriched fixtures frame (run_predictions.enrich_data)."""
+        registry = cls()
+        if fixtures is not None and not fixtures.empty:
+            for values in zip(*(fixtures[field] for field in FIELDS)):
+                # The first row of a duplicated game_id wins, like the frame lookup it replaces
+                registry.entries.setdefault(values[0], dict(zip(FIELDS, values)))
+        return registry
+
+    def add(self, game_id, start_date, home_team_id, away_team_id, team_strengths):
+        """Register an upcoming game, taking each team's strength from team_strengths
+        (team_id -> latest win percentage, DEFAULT_STRENGTH for unknown teams).
+
+        A game that is already registered keeps its entry; returns the entry.
+        """
+        if game_id not in self.entries:
+            self.entries[game_id] = {
+                'game_id': game_id,
+                'start_date': start_date,
+                'home_team_id': home_team_id,
+                'away_team_id': away_team_id,
+                'home_team_win_percentage_before': team_strengths.get(home_team_id, DEFAULT_STRENGTH),
+                'away_team_win_percentage_before': team_strengths.get(away_team_id, DEFAULT_STRENGTH)
+            }
+        return self.entries[game_id]
+
+    def get(self, game_id):
+        return self.entries.get(game_id)
+
+    def __getitem__(self, game_id):
+        return self.entries[game_id]
+
+    def __contains__(self, game_id):
+        return game_id in self.entries
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,217 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+from datetime import datetime
+
+import numpy as np
+
+from markets import MARKETS, market_stats
+
+# Enriched player history on disk for zero-copy reads. Every column is one .npy
+# file with the rows sorted by player, then start_date, and offsets.npy holds
+# where each player's rows begin. The files are opened as numpy.memmap, so
+# opening a store only parses the manifest, reading a player's window touches
+# only that player's pages, and every process reading the same store shares
+# them through the page cache.
+#
+# The manifest also carries what prediction needs besides the windows: player
+# names, each player's current team and the teams' latest win percentages.
+STORE_VERSION = 1
+MANIFEST_NAME = '_store.json'
+# start_date is stored as int64 nanoseconds since the epoch (UTC)
+BASE_COLUMNS = ['start_date', 'is_home', 'opponent_win_percentage_before']
+STAT_COLUMNS = market_stats(MARKETS)
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+default_store_dir = os.path.join(current_dir, 'history_store')
+
+def to_nanoseconds(dates):
+    """int64 UTC nanoseconds for a date Series or a single date."""
+    import pandas as pd
+
+    if isinstance(dates, pd.Series):
+        return pd.DatetimeIndex(pd.to_datetime(dates, utc=True)).as_unit('ns').asi8
+    stamp = pd.Timestamp(dates)
+    return (stamp.tz_localize('UTC') if stamp.tzinfo is None else stamp).value
+
+def write_store(root, player_history, latest_wins=None, player_current_team=None, error_model=None):
+    """Write an enriched player_history frame (run_predictions.enrich_data) to root,
+    with the history's error model (run_predictions.fit_history_errors) in the manifest.
+
+    Columns go into a new build directory and the manifest is swapped in last,
+    so processes that have the previous build open keep reading it unharmed.
+    The previous build is kept until the next write, for readers that read the
+    old manifest just before the swap.
+    """
+    import pandas as pd
+
+    ordered = player_history.sort_values(['player_id', 'start_date'], kind='mergesort')
+    codes, players = pd.factorize(ordered['player_id'])
+    offsets = np.r_[0, np.cumsum(np.bincount(codes, minlength=len(players)))].astype(np.int64)
+    stats = [stat for stat in STAT_COLUMNS if stat in ordered.columns]
+
+    build = f"build-{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
+    os.makedirs(os.path.join(root, build))
+    columns = {
+        'offsets': offsets,
+        'start_date': to_nanoseconds(ordered['start_date']),
+        'is_home': ordered['is_home'].fillna(False).to_numpy(dtype=bool),
+        'opponent_win_percentage_before': ordered['opponent_win_percentage_before'].to_numpy(dtype=float),
+        # Fixed-width strings, so they can be mapped too
+        'game_id': ordered['game_id'].astype(str).to_numpy(dtype=str)
+    }
+    for stat in stats:
+        columns[stat] = ordered[stat].to_numpy(dtype=float)
+    for name, values in columns.items():
+        np.save(os.path.join(root, build, f"{name}.npy"), np.ascontiguousarray(values))
+
+    names = {}
+    if 'player_name' in ordered.columns:
+        latest = ordered.dropna(subset=['player_name']).drop_duplicates('player_id', keep='last')
+        names = dict(zip(latest['player_id'], latest['player_name']))
+    manifest = {
+        'version': STORE_VERSION,
+        'built_at': datetime.now().isoformat(),
+        'build': build,
+        'history_watermark': pd.to_datetime(ordered['start_date'], utc=True).max().isoformat(),
+        'rows': len(ordered),
+        'stats': stats,
+        'players': list(players),
+        'player_names': names,
+        'player_current_team': player_current_team or {},
+        'teams': {team_id: round(float(pct), 6) for team_id, pct in (latest_wins or {}).items()},
+        'error_model': error_model
+    }
+    previous = read_manifest(root).get('build') if os.path.exists(os.path.join(root, MANIFEST_NAME)) else None
+    tmp_path = os.path.join(root, MANIFEST_NAME + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, separators=(',', ':'))
+    os.replace(tmp_path, os.path.join(root, MANIFEST_NAME))
+
+    # Builds before the previous one can go: a process still mapping one keeps its pages until it exits
+    for entry in os.listdir(root):
+        if entry.startswith('build-') and entry not in (build, previous):
+            shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+    return manifest
+
+def read_manifest(root):
+    with open(os.path.join(root, MANIFEST_NAME), 'r') as f:
+        return json.load(f)
+
+class HistoryStore:
+    def __init__(self, root):
+        self.root = root
+        try:
+            self._open(read_manifest(root))
+        except FileNotFoundError:
+            # Two writes landed between reading the manifest and mapping its build; the manifest now names a newer one
+            self._open(read_manifest(root))
+
+    def _open(self, manifest):
+        if manifest.get('version') != STORE_VERSION:
+            raise ValueError(f"Unsupported history store version {manifest.get('version')} (expected {STORE_VERSION})")
+        self.manifest = manifest
+        self.stats = manifest['stats']
+        self.players = manifest['players']
+        self.player_index = {player_id: i for i, player_id in enumerate(self.players)}
+        directory = os.path.join(self.root, manifest['build'])
+        # np.load with mmap_mode returns numpy.memmap views; nothing is read until it is indexed
+        self.offsets = np.load(os.path.join(directory, 'offsets.npy'), mmap_mode='r')
+        self.columns = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r')
+                        for name in BASE_COLUMNS + self.stats}
+        self.game_ids = np.load(os.path.join(directory, 'game_id.npy'), mmap_mode='r')
+
+    def player_rows(self, player_id):
+        """The (start, stop) row range of a player, empty for unknown players."""
+        i = self.player_index.get(player_id)
+        if i is None:
+            return 0, 0
+        return int(self.offsets[i]), int(self.offsets[i + 1])
+
+    def window(self, player_id, before, n, stats):
+        """The player's last n games before the date before.
+
+        Returns (opponent win percentages with NaN as 0.5, home flags, values of
+        shape (games, len(stats)) with NaN as 0), oldest first, the way
+        run_predictions.predict_player_markets weights them.
+        """
+        lo, hi = self.player_rows(player_id)
+        stop = lo + int(np.searchsorted(self.columns['start_date'][lo:hi], to_nanoseconds(before), side='left'))
+        start = max(lo, stop - n)
+        opp_win_pct = np.nan_to_num(self.columns['opponent_win_percentage_before'][start:stop], nan=0.5)
+        was_home = np.asarray(self.columns['is_home'][start:stop], dtype=bool)
+        values = np.nan_to_num(np.column_stack([self.columns[stat][start:stop] for stat in stats])
+                               if stats else np.zeros((stop - start, 0)))
+        return opp_win_pct, was_home, values
+
+    def player_frame(self, player_id):
+        """One player's rows as a DataFrame, for debugging."""
+        import pandas as pd
+
+        lo, hi = self.player_rows(player_id)
+        frame = pd.DataFrame({name: np.asarray(values[lo:hi]) for name, values in self.columns.items()})
+        frame['start_date'] = pd.to_datetime(frame['start_date'], utc=True)
+        frame.insert(0, 'game_id', np.asarray(self.game_ids[lo:hi], dtype=object))
+        frame.insert(0, 'player_id', player_id)
+        return frame
+
+    def to_frame(self, stats=None):
+        """The whole store as a DataFrame (a copy) for code that needs one."""
+        import pandas as pd
+
+        columns = BASE_COLUMNS + [stat for stat in (stats or self.stats) if stat in self.columns]
+        frame = pd.DataFrame({name: np.asarray(self.columns[name]) for name in columns})
+        frame['start_date'] = pd.to_datetime(frame['start_date'], utc=True)
+        frame.insert(0, 'game_id', np.asarray(self.game_ids, dtype=object))
+        frame.insert(0, 'player_id', np.repeat(np.array(self.players, dtype=object), np.diff(self.offsets)))
+        return frame
+
+    def player_codes(self):
+        return np.repeat(np.arange(len(self.players)), np.diff(self.offsets))
+
+    def split_date(self, quantile=0.8):
+        """The start_date quantile nba_prop_trainer.split_train_test splits at, in nanoseconds."""
+        import pandas as pd
+
+        return to_nanoseconds(pd.Series(pd.to_datetime(np.asarray(self.columns['start_date']), utc=True)).quantile(quantile))
+
+    def window_arrays(self, stat, after=None):
+        """(player codes, stat, opponent win percentage, home flags) for nba_prop_trainer.gather_window_arrays.
+
+        Without after these are the mapped columns themselves; with it, only the
+        rows later than after are taken, as in the trainer's test split.
+        """
+        arrays = (self.player_codes(), self.columns[stat], self.columns['opponent_win_percentage_before'], self.columns['is_home'])
+        if after is None:
+            return arrays
+        rows = np.flatnonzero(np.asarray(self.columns['start_date']) > after)
+        return tuple(np.asarray(values)[rows] for values in arrays)
+
+    def resolver(self):
+        from player_identity import PlayerResolver
+
+        counts = np.diff(self.offsets)
+        return PlayerResolver(self.players, self.manifest['player_names'], dict(zip(self.players, counts.tolist())))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build the memory-mapped player history store')
+    parser.add_argument('--data_dir', type=str, help='Build from player_history.csv, fixtures.csv and player_teams.csv here instead of Supabase', required=False)
+    parser.add_argument('--out_dir', type=str, default=default_store_dir, help='Store directory (default: history_store)')
+    args = parser.parse_args(argv)
+
+    import run_predictions
+    from data_audit import load_tables
+
+    player_history, fixtures, player_teams = load_tables(args.data_dir)
+    data = run_predictions.enrich_data(player_history, fixtures, player_teams)
+    if data['player_history'].empty:
+        print("ERROR: No player history to store")
+        sys.exit(1)
+    manifest = write_store(args.out_dir, data['player_history'], data['latest_wins'], data['player_current_team'])
+    print(f"Wrote {manifest['rows']} rows for {len(manifest['players'])} players ({', '.join(manifest['stats'])}) "
+          f"through {manifest['history_watermark']} to {args.out_dir}")
+
+if __name__ == "__main__":
+    main()
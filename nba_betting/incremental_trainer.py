@@ -0,0 +1,248 @@
+import pandas as pd
+import numpy as np
+import json
+import os
+import argparse
+
+from nba_prop_trainer import (
+    DEFAULT_STATS, PARAM_GRID, FINE_PARAM_GRID, TRAINABLE_STATS, best_params_path, current_dir,
+    enrich_player_history, gather_windows, load_player_history, save_best_params, score_windows, split_train_test
+)
+
+# Warm-start state written next to best_params.json
+STATE_VERSION = 2
+default_state_path = os.path.join(current_dir, "incremental_state.npz")
+
+BUFFER_COLUMNS = ['player_id', 'game_id', 'start_date', 'is_home', 'opponent_win_percentage_before']
+FOLDED_COLUMNS = ['player_id', 'game_id', 'start_date']
+
+# Box scores can land days after the game. The state remembers the
+# (player_id, game_id) pairs it folded in over this many days before the
+# watermark, so a late row in that window is still folded in exactly once.
+LATE_GAME_DAYS = 30
+
+def score_grid(df, stat, param_grid, target_col=None):
+    """Absolute error sums and counts for every (N, decay_factor, home_advantage)."""
+    shape = (len(param_grid['N']), len(param_grid['decay_factor']), len(param_grid['home_advantage']))
+    abs_err = np.zeros(shape)
+    counts = np.zeros(shape, dtype=np.int64)
+    for n_idx, N in enumerate(param_grid['N']):
+        windows = gather_windows(df, stat, N, target_col=target_col)
+        abs_err[n_idx], counts[n_idx] = score_windows(windows, N, param_grid['decay_factor'], param_grid['home_advantage'])
+    return abs_err, counts
+
+def tail_buffer(df, stats, max_n):
+    """Keep each player's last max_n games, which is all later windows can reach."""
+    ordered = df.sort_values(['player_id', 'start_date'], kind='mergesort')
+    return ordered.groupby('player_id', sort=False).tail(max_n)[BUFFER_COLUMNS + stats].reset_index(drop=True)
+
+def empty_state(stats, param_grid):
+    shape = (len(param_grid['N']), len(param_grid['decay_factor']), len(param_grid['home_advantage']))
+    return {
+        'version': STATE_VERSION,
+        'param_grid': param_grid,
+        'stats': list(stats),
+        'watermark': None,
+        'folded_from': None,
+        'folded': pd.DataFrame(columns=FOLDED_COLUMNS),
+        'abs_err': {stat: np.zeros(shape) for stat in stats},
+        'counts': {stat: np.zeros(shape, dtype=np.int64) for stat in stats},
+        'buffer': pd.DataFrame(columns=BUFFER_COLUMNS + list(stats)),
+    }
+
+def build_state(eval_data, stats, param_grid):
+    state = empty_state(stats, param_grid)
+    update_state(state, eval_data)
+    return state
+
+def game_keys(frame):
+    return frame['player_id'].astype(str) + '|' + frame['game_id'].astype(str)
+
+def unfolded_games(state, games):
+    """The rows of games not yet folded into the state.
+
+    A row is new if it is dated within LATE_GAME_DAYS of the watermark (or
+    later) and its (player_id, game_id) is not in state['folded']. Rows before
+    folded_from, the first date the state folded in, never are: for a state
+    built with --init those are the trainer's training split.
+    """
+    if state['watermark'] is None:
+        return games
+    window_start = state['watermark'] - pd.Timedelta(days=LATE_GAME_DAYS)
+    if state['folded_from'] is not None:
+        window_start = max(window_start, state['folded_from'])
+    fresh = (games['start_date'] >= window_start) & ~game_keys(games).isin(game_keys(state['folded']))
+    return games[fresh.to_numpy()]
+
+def update_state(state, new_games, target_from=None, player_chunks=1):
+    """Fold newly completed games into the error sums without touching older games.
+
+    Rows already folded in are skipped by (player_id, game_id), so a box score
+    that arrives after later games is still counted once. Rows before
+    target_from only extend the per-player history buffer. With
+    player_chunks > 1 the windows are gathered for one group of players at a
+    time, which bounds the size of the window arrays.
+    """
+    new_games = unfolded_games(state, new_games)
+    if new_games.empty:
+        return 0
+    stats = state['stats']
+    is_target = True if target_from is None else new_games['start_date'] >= target_from
+    frames = [new_games[BUFFER_COLUMNS + stats].assign(_is_new=is_target)]
+    if len(state['buffer']):
+        frames.insert(0, state['buffer'].assign(_is_new=False))
+    combined = pd.concat(frames, ignore_index=True)
+    player_groups = np.array_split(combined['player_id'].unique(), max(1, player_chunks))
+    for players in player_groups:
+        group = combined[combined['player_id'].isin(players)] if player_chunks > 1 else combined
+        for stat in stats:
+            abs_err, counts = score_grid(group, stat, state['param_grid'], target_col='_is_new')
+            state['abs_err'][stat] += abs_err
+            state['counts'][stat] += counts
+    state['buffer'] = tail_buffer(combined, stats, max(state['param_grid']['N']))
+    latest = new_games['start_date'].max()
+    if state['watermark'] is None:
+        state['folded_from'] = new_games['start_date'].min()
+    state['watermark'] = latest if state['watermark'] is None else max(state['watermark'], latest)
+    folded = pd.concat([state['folded'], new_games[FOLDED_COLUMNS]], ignore_index=True)
+    window_start = state['watermark'] - pd.Timedelta(days=LATE_GAME_DAYS)
+    state['folded'] = folded[folded['start_date'] >= window_start].reset_index(drop=True)
+    return len(new_games)
+
+def rank_configs(state, stat):
+    """Return the best config, its MAE and its valid prediction count."""
+    grid = state['param_grid']
+    counts = state['counts'][stat]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mae = np.where(counts > 0, state['abs_err'][stat] / np.maximum(counts, 1), np.nan)
+    if np.all(np.isnan(mae)):
+        return None, np.nan, 0
+    n_idx, d_idx, h_idx = np.unravel_index(np.nanargmin(mae), mae.shape)
+    # opponent_weight cancels out of the weighted mean; keep the first non-zero value
+    opponent_weight = next((ow for ow in grid['opponent_weight'] if ow != 0), 1.0)
+    best = {
+        'N': int(grid['N'][n_idx]),
+        'decay_factor': float(grid['decay_factor'][d_idx]),
+        'home_advantage': float(grid['home_advantage'][h_idx]),
+        'opponent_weight': float(opponent_weight)
+    }
+    return best, float(mae[n_idx, d_idx, h_idx]), int(counts[n_idx, d_idx, h_idx])
+
+def save_state(state, path):
+    arrays = {
+        'meta': np.array(json.dumps({
+            'version': state['version'],
+            'param_grid': state['param_grid'],
+            'stats': state['stats'],
+            'watermark': state['watermark'].isoformat() if state['watermark'] is not None else None,
+            'folded_from': state['folded_from'].isoformat() if state['folded_from'] is not None else None,
+        })),
+    }
+    for col in FOLDED_COLUMNS:
+        arrays[f'folded__{col}'] = state['folded'][col].astype(str).to_numpy(dtype=str)
+    for stat in state['stats']:
+        arrays[f'abs_err__{stat}'] = state['abs_err'][stat]
+        arrays[f'counts__{stat}'] = state['counts'][stat]
+    buffer = state['buffer']
+    for col in buffer.columns:
+        if col in ('player_id', 'game_id', 'start_date'):
+            arrays[f'buffer__{col}'] = buffer[col].astype(str).to_numpy(dtype=str)
+        elif col == 'is_home':
+            arrays[f'buffer__{col}'] = buffer[col].to_numpy(dtype=bool)
+        else:
+            arrays[f'buffer__{col}'] = buffer[col].to_numpy(dtype=float)
+    tmp_path = path + '.tmp.npz'
+    np.savez_compressed(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+def load_state(path):
+    with np.load(path) as data:
+        meta = json.loads(str(data['meta']))
+        if meta['version'] not in (1, STATE_VERSION):
+            raise ValueError(f"Unsupported incremental state version {meta['version']} (expected {STATE_VERSION})")
+        state = {
+            'version': meta['version'],
+            'param_grid': meta['param_grid'],
+            'stats': meta['stats'],
+            'watermark': pd.Timestamp(meta['watermark']) if meta['watermark'] else None,
+            'folded_from': pd.Timestamp(meta['folded_from']) if meta.get('folded_from') else None,
+            'abs_err': {stat: data[f'abs_err__{stat}'] for stat in meta['stats']},
+            'counts': {stat: data[f'counts__{stat}'] for stat in meta['stats']},
+        }
+        buffer = pd.DataFrame({
+            key[len('buffer__'):]: data[key] for key in data.files if key.startswith('buffer__')
+        })
+        folded = pd.DataFrame({col: data[f'folded__{col}'] for col in FOLDED_COLUMNS if f'folded__{col}' in data.files},
+                              columns=FOLDED_COLUMNS)
+    buffer['start_date'] = pd.to_datetime(buffer['start_date'])
+    folded['start_date'] = pd.to_datetime(folded['start_date'])
+    state['buffer'] = buffer
+    state['folded'] = folded
+    if meta['version'] == 1 and state['watermark'] is not None:
+        # Version 1 states kept no folded pairs: treat everything up to their watermark as folded
+        state['folded_from'] = state['watermark'] + pd.Timedelta(microseconds=1)
+        state['version'] = STATE_VERSION
+    return state
+
+def load_new_games(data_dir, state, new_games_path=None):
+    """Enrich only the player_history rows not yet folded into the state."""
+    source = new_games_path or os.path.join(data_dir, 'player_history.csv')
+    player_history = unfolded_games(state, pd.read_csv(source, parse_dates=['start_date']))
+    if player_history.empty:
+        return player_history
+    fixtures = pd.read_csv(os.path.join(data_dir, 'fixtures.csv'), parse_dates=['start_date'])
+    player_teams = pd.read_csv(os.path.join(data_dir, 'player_teams.csv'))
+    player_teams = player_teams[player_teams['game_id'].isin(player_history['game_id'])]
+    return enrich_player_history(player_history, fixtures, player_teams)
+
+def write_best_params(state, path):
+    all_params = {}
+    for stat in state['stats']:
+        best, mae, valid = rank_configs(state, stat)
+        if best is None:
+            print(f"No valid parameters found for {stat}.")
+            continue
+        print(f"Best Params for {stat}: {best}, MAE: {mae:.4f}, Valid Predictions={valid}")
+        all_params[stat] = best
+    if all_params:
+        save_best_params(all_params, path)
+    return all_params
+
+def main():
+    parser = argparse.ArgumentParser(description='Warm-start parameter retraining from saved per-config error sums')
+    parser.add_argument('--data_dir', type=str, default=current_dir, help='Directory containing player_history.csv, fixtures.csv and player_teams.csv')
+    parser.add_argument('--state', type=str, default=default_state_path, help='Path of the saved incremental state')
+    parser.add_argument('--init', action='store_true', help='Build the state from the full history (same test split as the trainer)')
+    parser.add_argument('--grid', choices=['default', 'fine'], default='default', help='Parameter grid tracked by a new state')
+    parser.add_argument('--new_games', type=str, help='Optional CSV with only newly completed player_history rows', required=False)
+    parser.add_argument('--stats', choices=TRAINABLE_STATS, nargs='+',
+                        help=f"Stats to track (default: the saved state's, or {', '.join(DEFAULT_STATS)} for a new state); "
+                             "a different set rebuilds the state")
+    args = parser.parse_args()
+
+    state = None
+    if not args.init and os.path.exists(args.state):
+        state = load_state(args.state)
+        print(f"Loaded incremental state with watermark {state['watermark']}")
+        if args.stats and set(args.stats) != set(state['stats']):
+            print(f"State tracks {', '.join(state['stats'])}; rebuilding it for {', '.join(args.stats)}")
+            state = None
+        else:
+            watermark = state['watermark']
+            new_games = load_new_games(args.data_dir, state, args.new_games)
+            added = update_state(state, new_games)
+            late = int((new_games['start_date'] <= watermark).sum()) if added and watermark is not None else 0
+            print(f"Folded {added} new player games into the error sums ({late} dated on or before the previous watermark)")
+
+    if state is None:
+        print("Building incremental state from the full history...")
+        player_history = load_player_history(args.data_dir)
+        train_data, test_data = split_train_test(player_history)
+        state = build_state(test_data, args.stats or DEFAULT_STATS, FINE_PARAM_GRID if args.grid == 'fine' else PARAM_GRID)
+
+    save_state(state, args.state)
+    print(f"Saved incremental state to {args.state} (watermark {state['watermark']})")
+    write_best_params(state, best_params_path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# Optic prop markets we predict: the key saved as stat_type and the player_history
+# columns whose projections add up to it. Combined markets reuse the single-stat
+# parameters, so they need no training of their own.
+MARKETS = {
+    'points': ['points'],
+    'assists': ['assists'],
+    'total_rebounds': ['total_rebounds'],
+    'three_point_field_goals_made': ['three_point_field_goals_made'],
+    'steals': ['steals'],
+    'blocks': ['blocks'],
+    'points_rebounds_assists': ['points', 'total_rebounds', 'assists'],
+    'points_rebounds': ['points', 'total_rebounds'],
+    'points_assists': ['points', 'assists'],
+    'rebounds_assists': ['total_rebounds', 'assists'],
+}
+
+# Optic market names (lower case) for each key
+MARKET_NAMES = {
+    'player points': 'points',
+    'player assists': 'assists',
+    'player rebounds': 'total_rebounds',
+    'player made threes': 'three_point_field_goals_made',
+    'player threes': 'three_point_field_goals_made',
+    'player steals': 'steals',
+    'player blocks': 'blocks',
+    'player points + rebounds + assists': 'points_rebounds_assists',
+    'player points + rebounds': 'points_rebounds',
+    'player points + assists': 'points_assists',
+    'player rebounds + assists': 'rebounds_assists',
+}
+
+# Requested from /fixtures/odds by default
+DEFAULT_MARKETS = ['player points', 'player assists', 'player rebounds', 'player made threes', 'player steals',
+                   'player blocks', 'player points + rebounds + assists', 'player points + rebounds',
+                   'player points + assists', 'player rebounds + assists']
+
+def market_key(name):
+    """Map an Optic market name to its key, or None if we do not predict it."""
+    return MARKET_NAMES.get(name.strip().lower())
+
+def market_stats(markets):
+    """The distinct stat columns needed for markets, in first-use order."""
+    return list(dict.fromkeys(stat for market in markets for stat in MARKETS[market]))
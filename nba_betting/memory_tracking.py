@@ -0,0 +1,262 @@
+import os
+import sys
+import json
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+from metrics import registry as metrics
+
+# Memory use per pipeline stage for --memory and --memory_budget. Like
+# profiling.py, nothing is recorded until enable_memory_tracking() is called,
+# so track_stage() costs one check in normal runs.
+#
+# A sampler thread reads the resident set size (RSS) every SAMPLE_SECONDS and
+# keeps the peak of every open stage, so a spike inside a pandas merge is seen
+# even though the stage ends lower. With tracing on, tracemalloc adds each
+# stage's peak of Python allocations and the source lines that grew the most,
+# and record_frame() notes the deep size of the large DataFrames.
+SAMPLE_SECONDS = 0.05
+TOP_ALLOCATIONS = 5
+MB = 1024 * 1024
+
+_state = None
+
+class MemoryBudgetExceeded(Exception):
+    pass
+
+def current_rss():
+    """Resident set size of this process in bytes, or None if it cannot be read.
+
+    Off Linux this falls back to the peak RSS from getrusage, which never drops.
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def available_memory():
+    """Bytes the host can still hand out without swapping (MemAvailable), or None off Linux."""
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+def enable_memory_tracking(trace=False, budget_mb=None):
+    """Start sampling RSS; trace also starts tracemalloc. Returns the effective budget in bytes, or None.
+
+    A budget above what the host has available (RSS now plus MemAvailable) would
+    only be reached after the host starts swapping, so it is lowered to that.
+    """
+    global _state
+    rss = current_rss() or 0
+    budget = None
+    if budget_mb is not None:
+        budget = int(budget_mb * MB)
+        available = available_memory()
+        if available is not None and rss + available < budget:
+            print(f"Memory budget of {budget_mb:g} MB is more than the {(rss + available) / MB:.0f} MB available; "
+                  f"using {(rss + available) / MB:.0f} MB", file=sys.stderr)
+            budget = rss + available
+    if trace and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _state = {
+        'trace': trace,
+        'budget': budget,
+        'started_rss': rss,
+        'peak_rss': rss,
+        'open': [],
+        'stages': [],
+        'frames': [],
+        'lock': threading.Lock(),
+        'stop': threading.Event()
+    }
+    threading.Thread(target=_sample, args=(_state,), daemon=True).start()
+    return budget
+
+def memory_tracking_enabled():
+    return _state is not None
+
+def memory_budget():
+    """The effective budget in bytes, or None without --memory_budget."""
+    return _state['budget'] if _state is not None else None
+
+def peak_rss():
+    """The highest RSS sampled since tracking started, in bytes, or None while it is off."""
+    if _state is None:
+        return None
+    _observe(_state, current_rss())
+    return _state['peak_rss']
+
+def disable_memory_tracking():
+    global _state
+    if _state is None:
+        return
+    _state['stop'].set()
+    if _state['trace']:
+        tracemalloc.stop()
+    _state = None
+
+def _sample(state):
+    while not state['stop'].wait(SAMPLE_SECONDS):
+        _observe(state, current_rss())
+
+def _observe(state, rss):
+    if rss is None:
+        return
+    with state['lock']:
+        state['peak_rss'] = max(state['peak_rss'], rss)
+        for record in state['open']:
+            record['peak_rss'] = max(record['peak_rss'], rss)
+
+def check_budget(where, expected_bytes=0):
+    """Raise MemoryBudgetExceeded if RSS plus expected_bytes is over the budget.
+
+    expected_bytes lets a caller stop before a step it knows will grow memory.
+    """
+    if _state is None or _state['budget'] is None:
+        return
+    rss = current_rss()
+    if rss is None:
+        return
+    _observe(_state, rss)
+    if rss + expected_bytes > _state['budget']:
+        needed = f" and {expected_bytes / MB:.0f} MB more expected" if expected_bytes else ''
+        raise MemoryBudgetExceeded(f"Memory budget of {_state['budget'] / MB:.0f} MB exceeded at {where}: "
+                                   f"RSS is {rss / MB:.0f} MB{needed}. Predict from --history_store or --state "
+                                   f"(built on a larger host) to use less memory")
+
+@contextmanager
+def track_stage(name):
+    """Record RSS (and traced allocations) over a stage.
+
+    Yields a dict that is filled in when the stage ends, for its stage_end event;
+    it stays empty while tracking is off. Raises MemoryBudgetExceeded after a
+    stage whose sampled peak went over the budget.
+    """
+    usage = {}
+    state = _state
+    if state is None:
+        yield usage
+        return
+    rss = current_rss() or 0
+    record = {'name': name, 'start_rss': rss, 'peak_rss': rss}
+    if state['trace']:
+        current, peak = tracemalloc.get_traced_memory()
+        # reset_peak() below is global, so fold the peak so far into the stages already open
+        for parent in state['open']:
+            parent['traced_peak'] = max(parent['traced_peak'], peak)
+        tracemalloc.reset_peak()
+        record.update(traced_start=current, traced_peak=current, snapshot=_snapshot())
+    with state['lock']:
+        state['open'].append(record)
+    try:
+        yield usage
+    finally:
+        end_rss = current_rss() or 0
+        _observe(state, end_rss)
+        with state['lock']:
+            state['open'].remove(record)
+        row = {
+            'stage': name,
+            'rss_mb': round(end_rss / MB, 1),
+            'rss_delta_mb': round((end_rss - record['start_rss']) / MB, 1),
+            'peak_rss_mb': round(record['peak_rss'] / MB, 1)
+        }
+        if state['trace']:
+            current, peak = tracemalloc.get_traced_memory()
+            record['traced_peak'] = max(record['traced_peak'], peak)
+            for parent in state['open']:
+                parent['traced_peak'] = max(parent['traced_peak'], record['traced_peak'])
+            row['traced_peak_mb'] = round((record['traced_peak'] - record['traced_start']) / MB, 1)
+            row['top_allocations'] = top_allocations(record.pop('snapshot'), _snapshot())
+        state['stages'].append(row)
+        usage.update({key: value for key, value in row.items() if key not in ('stage', 'top_allocations')})
+    metrics.set('stage_peak_rss_bytes', record['peak_rss'], stage=name)
+    if state['budget'] is not None and record['peak_rss'] > state['budget']:
+        raise MemoryBudgetExceeded(f"Memory budget of {state['budget'] / MB:.0f} MB exceeded during {name}: "
+                                   f"RSS peaked at {record['peak_rss'] / MB:.0f} MB. Predict from --history_store "
+                                   f"or --state (built on a larger host) to use less memory")
+
+def _snapshot():
+    return tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen *>'),
+        tracemalloc.Filter(False, '<unknown>')
+    ])
+
+def top_allocations(before, after, limit=TOP_ALLOCATIONS):
+    """The source lines whose live allocations grew the most between two snapshots."""
+    rows = []
+    for stat in after.compare_to(before, 'lineno')[:limit]:
+        if stat.size_diff <= 0:
+            break
+        frame = stat.traceback[0]
+        rows.append({
+            'where': f"{short_path(frame.filename)}:{frame.lineno}",
+            'size_mb': round(stat.size_diff / MB, 2),
+            'blocks': stat.count_diff
+        })
+    return rows
+
+def short_path(path):
+    """The last three parts of a source path, e.g. pandas/core/frame.py."""
+    return '/'.join(path.replace('\\', '/').split('/')[-3:])
+
+def record_frame(name, frame):
+    """Note a DataFrame's deep size under the innermost open stage (only with tracing on)."""
+    if _state is None or not _state['trace']:
+        return
+    stage = _state['open'][-1]['name'] if _state['open'] else None
+    _state['frames'].append({
+        'frame': name,
+        'stage': stage,
+        'rows': len(frame),
+        'size_mb': round(frame.memory_usage(deep=True).sum() / MB, 1)
+    })
+
+def print_summary(stream=None):
+    stream = stream or sys.stderr
+    print(f"\nMemory (peak RSS {_state['peak_rss'] / MB:.0f} MB, started at {_state['started_rss'] / MB:.0f} MB"
+          + (f", budget {_state['budget'] / MB:.0f} MB" if _state['budget'] is not None else '') + ")", file=stream)
+    print(f"{'stage':<24} {'end MB':>9} {'delta MB':>9} {'peak MB':>9} {'traced MB':>10}", file=stream)
+    for row in _state['stages']:
+        traced = f"{row['traced_peak_mb']:>10.1f}" if 'traced_peak_mb' in row else f"{'':>10}"
+        print(f"{row['stage'][:24]:<24} {row['rss_mb']:>9.1f} {row['rss_delta_mb']:>9.1f} {row['peak_rss_mb']:>9.1f} {traced}",
+              file=stream)
+    allocations = sorted(((row['stage'], allocation) for row in _state['stages'] for allocation in row.get('top_allocations', [])),
+                         key=lambda item: item[1]['size_mb'], reverse=True)
+    if allocations:
+        print("\nLargest allocations still live at the end of their stage", file=stream)
+        for stage, allocation in allocations[:3 * TOP_ALLOCATIONS]:
+            print(f"{stage[:24]:<24} {allocation['size_mb']:>9.1f} MB  {allocation['where']}", file=stream)
+    if _state['frames']:
+        print("\nDataFrames (deep size)", file=stream)
+        for frame in sorted(_state['frames'], key=lambda frame: frame['size_mb'], reverse=True):
+            print(f"{frame['frame'][:24]:<24} {frame['size_mb']:>9.1f} MB  {frame['rows']:>9} rows  ({frame['stage']})", file=stream)
+
+def write_report(path):
+    report = {
+        'written_at': datetime.now().isoformat(),
+        'started_rss_mb': round(_state['started_rss'] / MB, 1),
+        'peak_rss_mb': round(_state['peak_rss'] / MB, 1),
+        'budget_mb': round(_state['budget'] / MB, 1) if _state['budget'] is not None else None,
+        'stages': _state['stages'],
+        'frames': _state['frames']
+    }
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote memory report for {len(_state['stages'])} stages to {path}", file=sys.stderr)
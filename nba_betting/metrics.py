@@ -0,0 +1,100 @@
+import os
+import threading
+
+# Prometheus text-format metrics for prediction runs, written as a node_exporter
+# textfile or pushed to a Pushgateway-compatible endpoint.
+PREFIX = 'nba_predictions_'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRICS = {
+    'rows_loaded': ('gauge', 'Rows loaded per table in the last run'),
+    'http_requests_total': ('counter', 'HTTP requests by endpoint and outcome'),
+    'http_request_duration_seconds': ('histogram', 'HTTP request latency by endpoint'),
+    'generated_total': ('counter', 'Predictions generated'),
+    'skipped_total': ('counter', 'Prop lines without a prediction, by reason'),
+    'player_resolutions_total': ('counter', 'Odds players matched to player_history, by method'),
+    'fixtures_total': ('counter', 'Fixtures processed, by outcome'),
+    'upserts_total': ('counter', 'custom_projections upserts by result'),
+    'stage_duration_seconds': ('gauge', 'Duration of each stage in the last run'),
+    'stage_peak_rss_bytes': ('gauge', 'Peak resident memory during each stage in the last run (--memory or --memory_budget)'),
+    'peak_rss_bytes': ('gauge', 'Peak resident memory of the last run (--memory or --memory_budget)'),
+    'run_duration_seconds': ('gauge', 'Duration of the last run'),
+    'run_success': ('gauge', '1 if the last run finished without an error, else 0'),
+    'last_run_timestamp_seconds': ('gauge', 'Unix time the last run finished'),
+}
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = [(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for k, v in pairs]
+    return '{' + ','.join(f'{k}="{v}"' for k, v in escaped) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {name: {} for name in METRICS}
+
+    def inc(self, name, amount=1, **labels):
+        with self.lock:
+            key = _label_key(labels)
+            self.samples[name][key] = self.samples[name].get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.samples[name][_label_key(labels)] = value
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS, **labels):
+        with self.lock:
+            key = _label_key(labels)
+            hist = self.samples[name].setdefault(key, {'buckets': {b: 0 for b in buckets}, 'sum': 0.0, 'count': 0})
+            for bound in hist['buckets']:
+                if value <= bound:
+                    hist['buckets'][bound] += 1
+            hist['sum'] += value
+            hist['count'] += 1
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name, (kind, help_text) in METRICS.items():
+                series = self.samples[name]
+                if not series:
+                    continue
+                full_name = PREFIX + name
+                lines.append(f"# HELP {full_name} {help_text}")
+                lines.append(f"# TYPE {full_name} {kind}")
+                for key, value in sorted(series.items()):
+                    if kind == 'histogram':
+                        for bound, count in value['buckets'].items():
+                            lines.append(f"{full_name}_bucket{_format_labels(key, [('le', _format_value(bound))])} {count}")
+                        lines.append(f"{full_name}_bucket{_format_labels(key, [('le', '+Inf')])} {value['count']}")
+                        lines.append(f"{full_name}_sum{_format_labels(key)} {_format_value(value['sum'])}")
+                        lines.append(f"{full_name}_count{_format_labels(key)} {value['count']}")
+                    else:
+                        lines.append(f"{full_name}{_format_labels(key)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path):
+        # Write then rename so the textfile collector never reads a partial file
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def push(self, url, job='run_predictions'):
+        import requests
+
+        response = requests.put(f"{url.rstrip('/')}/metrics/job/{job}", data=self.render().encode('utf-8'),
+                                headers={'Content-Type': 'text/plain; version=0.0.4'}, timeout=10)
+        response.raise_for_status()
+
+registry = MetricsRegistry()
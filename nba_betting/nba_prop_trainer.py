@@ -3,55 +3,92 @@ from sklearn.metrics import mean_absolute_error
 import itertools
 import numpy as np
 import json
+import os
+import argparse
+
+# Set up paths relative to the nba_betting directory
+current_dir = os.path.dirname(os.path.abspath(__file__))
+best_params_path = os.path.join(current_dir, "best_params.json")
+
+# Stats trained by default; the rest of TRAINABLE_STATS are opt-in with --stats
+DEFAULT_STATS = ['points', 'assists', 'total_rebounds']
+TRAINABLE_STATS = DEFAULT_STATS + ['three_point_field_goals_made', 'steals', 'blocks']
+
+# Default search space used by the original exhaustive search
+PARAM_GRID = {
+    'N': [3, 5, 10, 15, 20],  # Expanded range
+    'decay_factor': [0.7, 0.8, 0.85, 0.9, 0.95],  # Finer steps
+    'home_advantage': [0.0, 0.05, 0.1, 0.15, 0.2],  # Wider range
+    'opponent_weight': [0.5, 1.0, 1.5]  # New parameter
+}
+
+# Much finer search space, only practical with the tensor evaluator
+FINE_PARAM_GRID = {
+    'N': [3, 5, 7, 10, 12, 15, 20, 25, 30],
+    'decay_factor': [round(x, 2) for x in np.arange(0.50, 1.0001, 0.01)],
+    'home_advantage': [round(x, 3) for x in np.arange(0.0, 0.3001, 0.005)],
+    'opponent_weight': [0.5, 1.0, 1.5]
+}
 
 # Load data with date parsing
-player_history = pd.read_csv('/Users/claytucker/trendybets/nba_betting/player_history.csv', parse_dates=['start_date'])
-fixtures = pd.read_csv('/Users/claytucker/trendybets/nba_betting/fixtures.csv', parse_dates=['start_date'])
-player_teams = pd.read_csv('/Users/claytucker/trendybets/nba_betting/player_teams.csv')
-player_history = player_history.merge(player_teams[['player_id', 'game_id', 'team_id']], on=['player_id', 'game_id'])
-
-# Prepare team win percentages
-team_game = []
-for _, row in fixtures.iterrows():
-    home_team = eval(row['home_competitors'])[0]['id']
-    away_team = eval(row['away_competitors'])[0]['id']
-    if pd.notna(row.get('home_score_total')) and pd.notna(row.get('away_score_total')):
-        won = row['home_score_total'] > row['away_score_total']
-        team_game.extend([
-            {'team_id': home_team, 'game_id': row['game_id'], 'start_date': row['start_date'], 'is_home': True, 'won': won},
-            {'team_id': away_team, 'game_id': row['game_id'], 'start_date': row['start_date'], 'is_home': False, 'won': not won}
-        ])
-team_game = pd.DataFrame(team_game)
-team_game = team_game.sort_values(['team_id', 'start_date'])
-team_game['cum_games_before'] = team_game.groupby('team_id').cumcount()
-team_game['cum_wins_before'] = team_game.groupby('team_id')['won'].cumsum().shift(1, fill_value=0)
-team_game['win_percentage_before'] = team_game['cum_wins_before'] / team_game['cum_games_before'].replace(0, 1)
-team_game['win_percentage_before'] = team_game['win_percentage_before'].fillna(0.5)
-
-# Merge to fixtures
-fixtures['home_team_id'] = fixtures['home_competitors'].apply(lambda x: eval(x)[0]['id'])
-fixtures['away_team_id'] = fixtures['away_competitors'].apply(lambda x: eval(x)[0]['id'])
-fixtures = fixtures.merge(
-    team_game[team_game['is_home']][['game_id', 'win_percentage_before']],
-    on='game_id', how='left'
-).rename(columns={'win_percentage_before': 'home_team_win_percentage_before'})
-fixtures = fixtures.merge(
-    team_game[~team_game['is_home']][['game_id', 'win_percentage_before']],
-    on='game_id', how='left'
-).rename(columns={'win_percentage_before': 'away_team_win_percentage_before'})
-latest_wins = team_game.groupby('team_id')['win_percentage_before'].last()
-fixtures['home_team_win_percentage_before'] = fixtures['home_team_win_percentage_before'].fillna(fixtures['home_team_id'].map(latest_wins)).fillna(0.5)
-fixtures['away_team_win_percentage_before'] = fixtures['away_team_win_percentage_before'].fillna(fixtures['away_team_id'].map(latest_wins)).fillna(0.5)
-
-# Enrich player history
-player_history = player_history.merge(
-    fixtures[['game_id', 'home_team_id', 'away_team_id', 'home_team_win_percentage_before', 'away_team_win_percentage_before']],
-    on='game_id', how='left'
-)
-player_history['is_home'] = player_history['team_id'] == player_history['home_team_id']
-player_history['opponent_win_percentage_before'] = player_history.apply(
-    lambda row: row['away_team_win_percentage_before'] if row['is_home'] else row['home_team_win_percentage_before'], axis=1
-)
+def load_player_history(data_dir=current_dir):
+    player_history = pd.read_csv(os.path.join(data_dir, 'player_history.csv'), parse_dates=['start_date'])
+    fixtures = pd.read_csv(os.path.join(data_dir, 'fixtures.csv'), parse_dates=['start_date'])
+    player_teams = pd.read_csv(os.path.join(data_dir, 'player_teams.csv'))
+    return enrich_player_history(player_history, fixtures, player_teams)
+
+# Add team, home/away and opponent strength columns to raw player history rows
+def enrich_player_history(player_history, fixtures, player_teams):
+    return join_player_features(player_history, add_team_strengths(fixtures), player_teams)
+
+# Team IDs and win percentages before each fixture
+def add_team_strengths(fixtures):
+    # Prepare team win percentages
+    team_game = []
+    for _, row in fixtures.iterrows():
+        home_team = eval(row['home_competitors'])[0]['id']
+        away_team = eval(row['away_competitors'])[0]['id']
+        if pd.notna(row.get('home_score_total')) and pd.notna(row.get('away_score_total')):
+            won = row['home_score_total'] > row['away_score_total']
+            team_game.extend([
+                {'team_id': home_team, 'game_id': row['game_id'], 'start_date': row['start_date'], 'is_home': True, 'won': won},
+                {'team_id': away_team, 'game_id': row['game_id'], 'start_date': row['start_date'], 'is_home': False, 'won': not won}
+            ])
+    team_game = pd.DataFrame(team_game)
+    team_game = team_game.sort_values(['team_id', 'start_date'])
+    team_game['cum_games_before'] = team_game.groupby('team_id').cumcount()
+    team_game['cum_wins_before'] = team_game.groupby('team_id')['won'].cumsum().shift(1, fill_value=0)
+    team_game['win_percentage_before'] = team_game['cum_wins_before'] / team_game['cum_games_before'].replace(0, 1)
+    team_game['win_percentage_before'] = team_game['win_percentage_before'].fillna(0.5)
+
+    # Merge to fixtures
+    fixtures['home_team_id'] = fixtures['home_competitors'].apply(lambda x: eval(x)[0]['id'])
+    fixtures['away_team_id'] = fixtures['away_competitors'].apply(lambda x: eval(x)[0]['id'])
+    fixtures = fixtures.merge(
+        team_game[team_game['is_home']][['game_id', 'win_percentage_before']],
+        on='game_id', how='left'
+    ).rename(columns={'win_percentage_before': 'home_team_win_percentage_before'})
+    fixtures = fixtures.merge(
+        team_game[~team_game['is_home']][['game_id', 'win_percentage_before']],
+        on='game_id', how='left'
+    ).rename(columns={'win_percentage_before': 'away_team_win_percentage_before'})
+    latest_wins = team_game.groupby('team_id')['win_percentage_before'].last()
+    fixtures['home_team_win_percentage_before'] = fixtures['home_team_win_percentage_before'].fillna(fixtures['home_team_id'].map(latest_wins)).fillna(0.5)
+    fixtures['away_team_win_percentage_before'] = fixtures['away_team_win_percentage_before'].fillna(fixtures['away_team_id'].map(latest_wins)).fillna(0.5)
+    return fixtures
+
+# Enrich player history with fixtures already passed through add_team_strengths
+def join_player_features(player_history, fixtures, player_teams):
+    player_history = player_history.merge(player_teams[['player_id', 'game_id', 'team_id']], on=['player_id', 'game_id'])
+    player_history = player_history.merge(
+        fixtures[['game_id', 'home_team_id', 'away_team_id', 'home_team_win_percentage_before', 'away_team_win_percentage_before']],
+        on='game_id', how='left'
+    )
+    player_history['is_home'] = player_history['team_id'] == player_history['home_team_id']
+    player_history['opponent_win_percentage_before'] = player_history.apply(
+        lambda row: row['away_team_win_percentage_before'] if row['is_home'] else row['home_team_win_percentage_before'], axis=1
+    )
+    return player_history
 
 # Prediction function with NaN handling and opponent_weight
 def predict_stat(df, stat, N, decay_factor, home_advantage, opponent_weight):
@@ -65,7 +102,7 @@ def predict_stat(df, stat, N, decay_factor, home_advantage, opponent_weight):
             positions = range(len(past_games))
             recency_weights = [decay_factor ** i for i in reversed(positions)]
             weights = (
-                pd.Series(recency_weights) *
+                pd.Series(recency_weights, index=past_games.index) *
                 past_games['opponent_win_percentage_before'].fillna(0.5) * opponent_weight *
                 past_games['is_home'].apply(lambda x: 1 + home_advantage if x else 1 - home_advantage)
             )
@@ -91,19 +128,153 @@ def predict_stat(df, stat, N, decay_factor, home_advantage, opponent_weight):
         print(f"Warning: No predictions generated for {stat}.")
     return preds_df
 
-# Train and test for multiple stats
-def train_model(stats):
-    param_grid = {
-        'N': [3, 5, 10, 15, 20],  # Expanded range
-        'decay_factor': [0.7, 0.8, 0.85, 0.9, 0.95],  # Finer steps
-        'home_advantage': [0.0, 0.05, 0.1, 0.15, 0.2],  # Wider range
-        'opponent_weight': [0.5, 1.0, 1.5]  # New parameter
+def gather_windows(df, stat, N, target_col=None):
+    """Collect every (player, game) prediction window of length N as dense arrays.
+
+    Windows are right-aligned so column N-1 is always the most recent past game;
+    shorter windows at the start of a player's history are left-padded and masked.
+    If target_col is given, only rows where that boolean column is True are
+    predicted; the other rows only contribute history.
+    """
+    ordered = df.sort_values(['player_id', 'start_date'], kind='mergesort')
+    return gather_window_arrays(pd.factorize(ordered['player_id'])[0], ordered[stat].to_numpy(dtype=float),
+                                ordered['opponent_win_percentage_before'].to_numpy(dtype=float),
+                                ordered['is_home'].to_numpy(dtype=bool), N,
+                                None if target_col is None else ordered[target_col].to_numpy(dtype=bool))
+
+def gather_window_arrays(player_codes, stat_values, opp_values, is_home, N, target_mask=None):
+    """gather_windows on rows already sorted by player, then start_date, given as arrays."""
+    n_rows = len(player_codes)
+
+    # Position of each row inside its player's history
+    group_start = np.zeros(n_rows, dtype=np.int64)
+    if n_rows:
+        is_first = np.r_[True, player_codes[1:] != player_codes[:-1]]
+        group_start = np.maximum.accumulate(np.where(is_first, np.arange(n_rows), 0))
+    is_target = np.arange(n_rows) > group_start
+    if target_mask is not None:
+        is_target &= target_mask
+    targets = np.flatnonzero(is_target)
+
+    offsets = np.arange(-N, 0)
+    window_idx = targets[:, None] + offsets[None, :]
+    mask = window_idx >= group_start[targets][:, None]
+    window_idx = np.where(mask, window_idx, targets[:, None])
+
+    home_sign = np.where(is_home, 1.0, -1.0)
+
+    return {
+        'stat': np.where(mask, np.nan_to_num(stat_values[window_idx]), 0.0),
+        'opp': np.where(mask, np.nan_to_num(opp_values[window_idx], nan=0.5), 0.0),
+        'home_sign': home_sign[window_idx],
+        'mask': mask,
+        'target_home_sign': home_sign[targets],
+        'target_opp': opp_values[targets],
+        'actual': stat_values[targets],
     }
-    all_params = {}
+
+def score_windows(windows, N, decays, has, chunk_size=4_000_000):
+    """Score gathered windows against every (decay_factor, home_advantage) pair.
+
+    The weighted mean is linear in home_advantage, so the windows are reduced
+    against every decay_factor with matrix products and the home_advantage axis
+    is added by broadcasting. Returns (abs_error_sum, valid_counts), each shaped
+    (len(decays), len(has)).
+    """
+    decays = np.asarray(decays, dtype=float)
+    has = np.asarray(has, dtype=float)
+    abs_err = np.zeros((len(decays), len(has)))
+    counts = np.zeros((len(decays), len(has)), dtype=np.int64)
+    n_targets = len(windows['actual'])
+    if n_targets == 0:
+        return abs_err, counts
+
+    # recency[j, d] = decay ** (N - 1 - j); column N-1 is the latest game
+    recency = decays[None, :] ** np.arange(N - 1, -1, -1)[:, None]
+    base = windows['opp'] * windows['mask']
+    signed = base * windows['home_sign']
+    num_a = (base * windows['stat']) @ recency
+    num_b = (signed * windows['stat']) @ recency
+    den_a = base @ recency
+    den_b = signed @ recency
+
+    target_ok = ~np.isnan(windows['target_opp']) & ~np.isnan(windows['actual'])
+    rows_per_chunk = max(1, chunk_size // max(1, len(decays) * len(has)))
+    h = has[None, :, None]
+    for start in range(0, n_targets, rows_per_chunk):
+        sl = slice(start, start + rows_per_chunk)
+        num = num_a[sl].T[:, None, :] + h * num_b[sl].T[:, None, :]
+        den = den_a[sl].T[:, None, :] + h * den_b[sl].T[:, None, :]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pred = num / den
+            final = pred * (1 + h * windows['target_home_sign'][sl]) * windows['target_opp'][sl] / 0.5
+        ok = (den != 0) & np.isfinite(final) & target_ok[sl]
+        abs_err += np.where(ok, np.abs(final - windows['actual'][sl]), 0.0).sum(axis=2)
+        counts += ok.sum(axis=2)
+
+    return abs_err, counts
+
+def evaluate_grid_tensor(df, stat, param_grid, rows=None):
+    """Evaluate the full parameter grid for one stat and return the MAE surface.
+
+    Windows are gathered once per N and scored with score_windows, from df or,
+    if given, from rows: the arrays gather_window_arrays takes before N (as
+    returned by HistoryStore.window_arrays). opponent_weight
+    scales every weight in a window equally and cancels out of the mean, so it
+    only matters when it is zero (which invalidates the prediction).
+
+    Returns a tuple (mae, valid_counts) of arrays shaped
+    (len(N), len(decay_factor), len(home_advantage), len(opponent_weight)).
+    """
+    ows = np.asarray(param_grid['opponent_weight'], dtype=float)
+    shape = (len(param_grid['N']), len(param_grid['decay_factor']), len(param_grid['home_advantage']), len(ows))
+    mae = np.full(shape, np.nan)
+    valid_counts = np.zeros(shape, dtype=np.int64)
+
+    for n_idx, N in enumerate(param_grid['N']):
+        windows = gather_windows(df, stat, N) if rows is None else gather_window_arrays(*rows, N)
+        abs_err, counts = score_windows(windows, N, param_grid['decay_factor'], param_grid['home_advantage'])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            surface = np.where(counts > 0, abs_err / np.maximum(counts, 1), np.nan)
+        for o_idx, ow in enumerate(ows):
+            if ow == 0:
+                continue
+            mae[n_idx, :, :, o_idx] = surface
+            valid_counts[n_idx, :, :, o_idx] = counts
+
+    return mae, valid_counts
+
+def surface_to_frame(stat, param_grid, mae, valid_counts):
+    index = pd.MultiIndex.from_product(
+        [param_grid['N'], param_grid['decay_factor'], param_grid['home_advantage'], param_grid['opponent_weight']],
+        names=['N', 'decay_factor', 'home_advantage', 'opponent_weight']
+    )
+    frame = pd.DataFrame({'mae': mae.ravel(), 'valid_predictions': valid_counts.ravel()}, index=index).reset_index()
+    frame.insert(0, 'stat', stat)
+    return frame
+
+def split_train_test(player_history):
     split_date = player_history['start_date'].quantile(0.8)
     train_data = player_history[player_history['start_date'] <= split_date]
     test_data = player_history[player_history['start_date'] > split_date]
-    
+    return train_data, test_data
+
+# Merge newly trained stats into best_params.json so stats trained separately are kept
+def save_best_params(all_params, path=best_params_path):
+    merged = {}
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            merged = json.load(f)
+    merged.update(all_params)
+    with open(path, 'w') as f:
+        json.dump(merged, f)
+    return merged
+
+# Train and test for multiple stats
+def train_model(player_history, stats, param_grid=PARAM_GRID):
+    all_params = {}
+    train_data, test_data = split_train_test(player_history)
+
     for stat in stats:
         best_mae = float('inf')
         best_params = None
@@ -120,18 +291,108 @@ def train_model(stats):
             if mae < best_mae:
                 best_mae = mae
                 best_params = {'N': N, 'decay_factor': decay, 'home_advantage': ha, 'opponent_weight': ow}
-        
+
         if best_params is None:
             print(f"No valid parameters found for {stat}.")
         else:
             print(f"Best Params for {stat}: {best_params}, Best MAE: {best_mae:.2f}")
             all_params[stat] = best_params
-    
+
     return all_params
 
-# Train for points, assists, total_rebounds
-stats_to_train = ['points', 'assists', 'total_rebounds']
-all_params = train_model(stats_to_train)
-if all_params:
-    with open('/Users/claytucker/trendybets/nba_betting/best_params.json', 'w') as f:
-        json.dump(all_params, f)
\ No newline at end of file
+# Same search as train_model, but every grid point is scored in one batched pass per N
+def train_model_tensor(player_history, stats, param_grid=PARAM_GRID, surface_path=None, store=None):
+    """train_model with evaluate_grid_tensor. With a HistoryStore instead of
+    player_history, windows are gathered from its mapped columns."""
+    all_params = {}
+    surfaces = []
+    if store is None:
+        train_data, test_data = split_train_test(player_history)
+    else:
+        test_data, split_date = None, store.split_date()
+
+    for stat in stats:
+        print(f"\nTraining for {stat} (tensor grid, {np.prod([len(v) for v in param_grid.values()])} combinations):")
+        rows = None if store is None else store.window_arrays(stat, after=split_date)
+        mae, valid_counts = evaluate_grid_tensor(test_data, stat, param_grid, rows=rows)
+        surfaces.append(surface_to_frame(stat, param_grid, mae, valid_counts))
+        if np.all(np.isnan(mae)):
+            print(f"No valid parameters found for {stat}.")
+            continue
+        n_idx, d_idx, h_idx, o_idx = np.unravel_index(np.nanargmin(mae), mae.shape)
+        best_params = {
+            'N': int(param_grid['N'][n_idx]),
+            'decay_factor': float(param_grid['decay_factor'][d_idx]),
+            'home_advantage': float(param_grid['home_advantage'][h_idx]),
+            'opponent_weight': float(param_grid['opponent_weight'][o_idx])
+        }
+        print(f"Best Params for {stat}: {best_params}, Best MAE: {mae[n_idx, d_idx, h_idx, o_idx]:.2f}, Valid Predictions={valid_counts[n_idx, d_idx, h_idx, o_idx]}")
+        all_params[stat] = best_params
+
+    if surface_path and surfaces:
+        pd.concat(surfaces, ignore_index=True).to_csv(surface_path, index=False)
+        print(f"Saved MAE surface to {surface_path}")
+
+    return all_params
+
+def main():
+    parser = argparse.ArgumentParser(description='Search prediction parameters for NBA player props')
+    parser.add_argument('--data_dir', type=str, default=current_dir, help='Directory containing player_history.csv, fixtures.csv and player_teams.csv')
+    parser.add_argument('--mode', choices=['loop', 'tensor'], default='loop', help='loop re-runs predict_stat per grid point; tensor scores the whole grid in batched passes')
+    parser.add_argument('--grid', choices=['default', 'fine'], default='default', help='Parameter grid to search (fine is only practical with --mode tensor)')
+    parser.add_argument('--surface_out', type=str, help='Optional CSV path for the full MAE surface (tensor mode)', required=False)
+    parser.add_argument('--strategy', choices=['grid', 'halving', 'hyperband', 'continuous'], default='grid', help='grid searches exhaustively with --mode; the others spend an evaluation budget adaptively')
+    parser.add_argument('--max_seconds', type=float, help='Per-stat time budget for adaptive strategies', required=False)
+    parser.add_argument('--max_evaluations', type=int, help='Per-stat budget in scored prediction windows for adaptive strategies', required=False)
+    parser.add_argument('--eta', type=int, default=3, help='Successive halving reduction factor')
+    parser.add_argument('--min_players', type=int, default=8, help='Smallest player subset used by successive halving')
+    parser.add_argument('--partitions', type=str, help='Stream season-partitioned history from this directory (see partitioned_history.py) instead of loading player_history.csv', required=False)
+    parser.add_argument('--eval_from', type=str, help='With --partitions, only score games on or after this date', required=False)
+    parser.add_argument('--player_chunks', type=int, default=1, help='With --partitions, gather windows for this many player groups separately')
+    parser.add_argument('--history_store', type=str, help='Read history from this memory-mapped store (see history_store.py) instead of player_history.csv', required=False)
+    parser.add_argument('--stats', choices=TRAINABLE_STATS, nargs='+', default=DEFAULT_STATS, help='Stats to train; others already in best_params.json are kept')
+    parser.add_argument('--trace_out', type=str, help='Optional CSV path for best MAE against compute spent (adaptive strategies)', required=False)
+    args = parser.parse_args()
+
+    param_grid = FINE_PARAM_GRID if args.grid == 'fine' else PARAM_GRID
+
+    stats_to_train = args.stats
+    if args.partitions:
+        from partitioned_history import train_partitioned
+        from incremental_trainer import write_best_params
+        state = train_partitioned(args.partitions, stats_to_train, param_grid, eval_from=args.eval_from, player_chunks=args.player_chunks)
+        write_best_params(state, best_params_path)
+        return
+
+    store = None
+    if args.history_store:
+        from history_store import HistoryStore
+        store = HistoryStore(args.history_store)
+        # Only the tensor grid reads the mapped columns directly; the other modes need a frame
+        player_history = None if args.mode == 'tensor' and args.strategy == 'grid' else store.to_frame()
+        available = store.stats
+    else:
+        player_history = load_player_history(args.data_dir)
+        available = player_history.columns
+    missing = [stat for stat in stats_to_train if stat not in available]
+    if missing:
+        print(f"Skipping stats not in player_history: {missing}")
+        stats_to_train = [stat for stat in stats_to_train if stat not in missing]
+    if args.strategy != 'grid':
+        from param_search import train_model_adaptive
+        train_data, test_data = split_train_test(player_history)
+        all_params = train_model_adaptive(
+            test_data, stats_to_train, args.strategy, param_grid,
+            max_seconds=args.max_seconds, max_evaluations=args.max_evaluations,
+            seed_params_path=best_params_path, trace_path=args.trace_out,
+            min_players=args.min_players, eta=args.eta
+        )
+    elif args.mode == 'tensor':
+        all_params = train_model_tensor(player_history, stats_to_train, param_grid, args.surface_out, store=store)
+    else:
+        all_params = train_model(player_history, stats_to_train, param_grid)
+    if all_params:
+        save_best_params(all_params)
+
+if __name__ == "__main__":
+    main()
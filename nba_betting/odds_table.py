@@ -0,0 +1,74 @@
+import os
+
+import pandas as pd
+import numpy as np
+
+# Columnar odds for one fixture: one row per sportsbook, player, market and side.
+# side is 'over', 'under', or None when the book does not say, in which case the
+# line counts for both sides. price is in American odds.
+ODDS_COLUMNS = ['player_id', 'market', 'sportsbook', 'side', 'line', 'price']
+KEY = ['player_id', 'market']
+# Stored odds snapshots (run_predictions.py --odds_snapshots, read by backtest.py)
+SNAPSHOT_COLUMNS = ['captured_at', 'fixture_id', 'game_id'] + ODDS_COLUMNS
+
+def empty_odds():
+    return pd.DataFrame({column: pd.Series(dtype='float64' if column in ('line', 'price') else 'object')
+                         for column in ODDS_COLUMNS})
+
+def odds_frame(columns):
+    """Build the table from a dict of equal-length column lists."""
+    table = pd.DataFrame(columns, columns=ODDS_COLUMNS)
+    table['line'] = table['line'].astype('float64')
+    table['price'] = pd.to_numeric(table['price'], errors='coerce')
+    return table
+
+def append_snapshot(path, table, fixture_id, game_id, captured_at):
+    """Append one fixture's odds table to the snapshot CSV at path."""
+    snapshot = table.assign(captured_at=captured_at, fixture_id=fixture_id, game_id=game_id)[SNAPSHOT_COLUMNS]
+    snapshot.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+
+def american_to_decimal(price):
+    price = np.asarray(price, dtype='float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(price > 0, 1 + price / 100, 1 + 100 / -price)
+
+def best_lines(table, key=KEY):
+    """Per player and market (or per key): the lowest over line and highest under
+    line across books, each at the best price for that line, plus the median line
+    and book count."""
+    table = table.assign(decimal_price=american_to_decimal(table['price']), sportsbook=table['sportsbook'].fillna('unknown'))
+    columns = key + ['line', 'price', 'sportsbook']
+
+    over = table[table['side'].fillna('over') == 'over']
+    over = over.sort_values(key + ['line', 'decimal_price'], ascending=[True] * len(key) + [True, False], na_position='last')
+    over = over.drop_duplicates(key)[columns]
+
+    under = table[table['side'].fillna('under') == 'under']
+    under = under.sort_values(key + ['line', 'decimal_price'], ascending=[True] * len(key) + [False, False], na_position='last')
+    under = under.drop_duplicates(key)[columns]
+
+    summary = table.groupby(key, sort=False).agg(median_line=('line', 'median'), books=('sportsbook', 'nunique')).reset_index()
+    return (summary.merge(over, on=key, how='left')
+                   .merge(under, on=key, how='left', suffixes=('_over', '_under')))
+
+def pick_side(priced, take_over):
+    """Set side, line, price, sportsbook and edge (projected_value - line) from the
+    over columns where take_over is true and the under columns elsewhere."""
+    priced = priced.copy()
+    for column in ('line', 'price', 'sportsbook'):
+        priced[column] = priced[f'{column}_over'].where(take_over, priced[f'{column}_under'])
+    priced['side'] = np.where(take_over, 'over', 'under')
+    priced['edge'] = priced['projected_value'] - priced['line']
+    return priced
+
+def price_edges(best, projections, key=KEY):
+    """Pick the side with the larger edge for each projection.
+
+    projections has player_id, market and projected_value columns. The result
+    adds side, line, price, sportsbook and edge (projected_value - line, so it
+    is negative for unders), in the order of projections.
+    """
+    priced = projections.merge(best, on=key, how='left')
+    over_edge = priced['projected_value'] - priced['line_over']
+    under_edge = priced['line_under'] - priced['projected_value']
+    return pick_side(priced, under_edge.isna() | (over_edge >= under_edge))
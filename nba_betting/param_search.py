@@ -0,0 +1,256 @@
+import time
+import json
+import math
+import numpy as np
+import pandas as pd
+
+from nba_prop_trainer import gather_windows, score_windows
+
+# Bounds for the continuous optimizer
+DECAY_BOUNDS = (0.05, 1.0)
+HOME_ADVANTAGE_BOUNDS = (0.0, 0.5)
+
+class BudgetExhausted(Exception):
+    pass
+
+class EvaluationBudget:
+    """Compute budget shared by a search run.
+
+    Cost is counted in scored prediction windows (one player-game for one
+    config), so strategies that work on player subsets are charged less than
+    full evaluations. Either limit may be None.
+    """
+    def __init__(self, max_seconds=None, max_evaluations=None):
+        self.max_seconds = max_seconds
+        self.max_evaluations = max_evaluations
+        self.evaluations = 0
+        self.started_at = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started_at
+
+    def exhausted(self):
+        if self.max_seconds is not None and self.elapsed >= self.max_seconds:
+            return True
+        if self.max_evaluations is not None and self.evaluations >= self.max_evaluations:
+            return True
+        return False
+
+    def charge(self, evaluations):
+        if self.exhausted():
+            raise BudgetExhausted()
+        self.evaluations += int(evaluations)
+
+class SearchTrace:
+    """Best full-data MAE found so far, recorded against compute spent."""
+    def __init__(self, stat, strategy, budget):
+        self.stat = stat
+        self.strategy = strategy
+        self.budget = budget
+        self.best_mae = float('inf')
+        self.best_params = None
+        self.rows = []
+
+    def record(self, params, mae):
+        if np.isnan(mae) or mae >= self.best_mae:
+            return
+        self.best_mae = mae
+        self.best_params = dict(params)
+        self.rows.append({
+            'stat': self.stat,
+            'strategy': self.strategy,
+            'elapsed_seconds': round(self.budget.elapsed, 4),
+            'evaluations': self.budget.evaluations,
+            'best_mae': mae,
+            **self.best_params
+        })
+        print(f"  [{self.budget.elapsed:7.2f}s, {self.budget.evaluations:>10} evals] MAE={mae:.4f} {self.best_params}")
+
+    def to_frame(self):
+        return pd.DataFrame(self.rows)
+
+class ConfigEvaluator:
+    """Scores individual configs on nested player subsets of the test data.
+
+    Players are shuffled once, so a subset of size k is always the first k
+    players and smaller rungs of successive halving are contained in larger ones.
+    Windows are cached per (subset size, N).
+    """
+    def __init__(self, df, stat, seed=0):
+        self.df = df
+        self.stat = stat
+        players = df['player_id'].unique()
+        np.random.default_rng(seed).shuffle(players)
+        self.players = players
+        self._windows = {}
+
+    @property
+    def n_players(self):
+        return len(self.players)
+
+    def _get_windows(self, n_players, N):
+        key = (n_players, N)
+        if key not in self._windows:
+            subset = self.df[self.df['player_id'].isin(self.players[:n_players])]
+            self._windows[key] = gather_windows(subset, self.stat, N)
+        return self._windows[key]
+
+    def evaluate(self, configs, n_players, budget):
+        """Return the MAE of every config on the first n_players players."""
+        n_players = min(n_players, self.n_players)
+        results = np.full(len(configs), np.nan)
+        by_n = {}
+        for i, config in enumerate(configs):
+            by_n.setdefault(int(config['N']), []).append(i)
+
+        for N, indices in by_n.items():
+            windows = self._get_windows(n_players, N)
+            budget.charge(len(windows['actual']) * len(indices))
+            # Score the distinct decay/home values of this N in one batched pass
+            decays = sorted({configs[i]['decay_factor'] for i in indices})
+            has = sorted({configs[i]['home_advantage'] for i in indices})
+            abs_err, counts = score_windows(windows, N, decays, has)
+            for i in indices:
+                config = configs[i]
+                if config.get('opponent_weight', 1.0) == 0:
+                    continue
+                d_idx = decays.index(config['decay_factor'])
+                h_idx = has.index(config['home_advantage'])
+                if counts[d_idx, h_idx] > 0:
+                    results[i] = abs_err[d_idx, h_idx] / counts[d_idx, h_idx]
+        return results
+
+def sample_configs(param_grid, n, rng):
+    """Draw n distinct configs from the grid (all of them if n exceeds its size)."""
+    keys = list(param_grid.keys())
+    sizes = [len(param_grid[k]) for k in keys]
+    total = int(np.prod(sizes))
+    flat = rng.choice(total, size=min(n, total), replace=False)
+    configs = []
+    for idx in flat:
+        config = {}
+        for key, position in zip(keys, np.unravel_index(idx, sizes)):
+            value = param_grid[key][position]
+            config[key] = int(value) if key == 'N' else float(value)
+        configs.append(config)
+    return configs
+
+def successive_halving(evaluator, configs, budget, trace, min_players=8, eta=3):
+    """Score configs on growing player subsets, keeping the best 1/eta each rung."""
+    n_players = min(min_players, evaluator.n_players)
+    survivors = list(configs)
+    while survivors:
+        full = n_players >= evaluator.n_players
+        maes = evaluator.evaluate(survivors, n_players, budget)
+        if full:
+            for config, mae in zip(survivors, maes):
+                trace.record(config, mae)
+            return
+        order = np.argsort(np.where(np.isnan(maes), np.inf, maes), kind='stable')
+        keep = max(1, len(survivors) // eta)
+        survivors = [survivors[i] for i in order[:keep] if not np.isnan(maes[i])]
+        n_players = min(n_players * eta, evaluator.n_players)
+
+def hyperband(evaluator, param_grid, budget, trace, min_players=8, eta=3, seed=0):
+    """Run successive-halving brackets that trade config count against subset size.
+
+    Brackets repeat (with fresh samples) until the budget runs out.
+    """
+    rng = np.random.default_rng(seed)
+    max_rungs = max(1, int(math.log(max(1, evaluator.n_players / min_players), eta)) + 1)
+    while True:
+        for bracket in reversed(range(max_rungs)):
+            n_configs = int(math.ceil(max_rungs / (bracket + 1) * eta ** bracket))
+            start_players = evaluator.n_players / eta ** bracket
+            configs = sample_configs(param_grid, n_configs, rng)
+            successive_halving(evaluator, configs, budget, trace, min_players=max(1, int(start_players)), eta=eta)
+        if budget.max_seconds is None and budget.max_evaluations is None:
+            return
+
+def continuous_search(evaluator, seed_params, budget, trace):
+    """Nelder-Mead over (decay_factor, home_advantage) with N fixed at the seed.
+
+    opponent_weight cancels out of the weighted mean, so it is carried over
+    from the seed unchanged.
+    """
+    from scipy.optimize import minimize
+
+    N = int(seed_params['N'])
+    opponent_weight = float(seed_params.get('opponent_weight', 1.0))
+
+    def objective(x):
+        config = {
+            'N': N,
+            'decay_factor': float(np.clip(x[0], *DECAY_BOUNDS)),
+            'home_advantage': float(np.clip(x[1], *HOME_ADVANTAGE_BOUNDS)),
+            'opponent_weight': opponent_weight
+        }
+        mae = evaluator.evaluate([config], evaluator.n_players, budget)[0]
+        trace.record(config, mae)
+        return mae if not np.isnan(mae) else 1e9
+
+    x0 = [seed_params['decay_factor'], seed_params['home_advantage']]
+    # Restart from the current optimum until the simplex stops improving
+    while True:
+        before = trace.best_mae
+        minimize(objective, x0, method='Nelder-Mead', bounds=[DECAY_BOUNDS, HOME_ADVANTAGE_BOUNDS],
+                 options={'xatol': 1e-4, 'fatol': 1e-6})
+        if trace.best_params is None or trace.best_mae >= before - 1e-9:
+            return
+        x0 = [trace.best_params['decay_factor'], trace.best_params['home_advantage']]
+
+def load_seed_params(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Could not read seed parameters from {path}: {e}")
+        return {}
+
+def run_search(test_data, stat, strategy, param_grid, budget, seed_params=None, min_players=8, eta=3, seed=0):
+    """Run one adaptive search strategy for one stat and return its trace."""
+    evaluator = ConfigEvaluator(test_data, stat, seed=seed)
+    trace = SearchTrace(stat, strategy, budget)
+    print(f"\nSearching {stat} with {strategy} ({evaluator.n_players} players)")
+    try:
+        if strategy == 'halving':
+            configs = sample_configs(param_grid, int(np.prod([len(v) for v in param_grid.values()])), np.random.default_rng(seed))
+            successive_halving(evaluator, configs, budget, trace, min_players=min_players, eta=eta)
+        elif strategy == 'hyperband':
+            hyperband(evaluator, param_grid, budget, trace, min_players=min_players, eta=eta, seed=seed)
+        elif strategy == 'continuous':
+            if not seed_params:
+                print(f"No seed parameters for {stat}, starting from the grid midpoint")
+                seed_params = {key: values[len(values) // 2] for key, values in param_grid.items()}
+            continuous_search(evaluator, seed_params, budget, trace)
+        else:
+            raise ValueError(f"Unknown search strategy: {strategy}")
+    except BudgetExhausted:
+        print(f"  Budget exhausted after {budget.elapsed:.2f}s and {budget.evaluations} evaluations")
+    return trace
+
+def train_model_adaptive(test_data, stats, strategy, param_grid, max_seconds=None, max_evaluations=None,
+                         seed_params_path=None, trace_path=None, min_players=8, eta=3, seed=0):
+    """Adaptive counterpart of train_model; budgets apply per stat."""
+    all_params = {}
+    traces = []
+    seeds = load_seed_params(seed_params_path) if strategy == 'continuous' and seed_params_path else {}
+
+    for stat in stats:
+        budget = EvaluationBudget(max_seconds=max_seconds, max_evaluations=max_evaluations)
+        trace = run_search(test_data, stat, strategy, param_grid, budget, seed_params=seeds.get(stat),
+                           min_players=min_players, eta=eta, seed=seed)
+        traces.append(trace.to_frame())
+        if trace.best_params is None:
+            print(f"No valid parameters found for {stat}.")
+            continue
+        print(f"Best Params for {stat}: {trace.best_params}, Best MAE: {trace.best_mae:.4f} "
+              f"({budget.elapsed:.2f}s, {budget.evaluations} evaluations)")
+        all_params[stat] = trace.best_params
+
+    if trace_path:
+        pd.concat(traces, ignore_index=True).to_csv(trace_path, index=False)
+        print(f"Saved search trace to {trace_path}")
+
+    return all_params
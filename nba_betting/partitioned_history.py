@@ -0,0 +1,147 @@
+import pandas as pd
+import json
+import os
+import sys
+import shutil
+import argparse
+
+from nba_prop_trainer import current_dir, add_team_strengths, join_player_features
+
+# Season-partitioned player history, one directory per season_year/season_type
+MANIFEST_NAME = '_manifest.json'
+MANIFEST_VERSION = 1
+default_partition_dir = os.path.join(current_dir, 'history_partitions')
+
+def require_parquet():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        print("ERROR: Partitioned history storage needs pyarrow.")
+        print("Please run: pip install pyarrow")
+        sys.exit(1)
+
+def partition_path(season_year, season_type):
+    return os.path.join(f"season_year={season_year}", f"season_type={season_type}")
+
+def fallback_season_year(start_date):
+    # NBA seasons are labelled by the year they start in (October)
+    return start_date.dt.year - (start_date.dt.month < 8).astype(int)
+
+def write_partitions(data_dir, out_dir, chunksize=250_000, overwrite=False):
+    """Convert player_history.csv into enriched Parquet files partitioned by season.
+
+    The CSV is read in chunks, so only one chunk of history is in memory while
+    converting. Each chunk appends one part file to every partition it touches.
+    """
+    require_parquet()
+    if os.path.exists(os.path.join(out_dir, MANIFEST_NAME)):
+        if not overwrite:
+            print(f"ERROR: {out_dir} already contains partitions. Use --overwrite to rebuild them.")
+            sys.exit(1)
+        for entry in load_manifest(out_dir)['partitions']:
+            shutil.rmtree(os.path.join(out_dir, entry['path']), ignore_errors=True)
+        os.remove(os.path.join(out_dir, MANIFEST_NAME))
+
+    fixtures = add_team_strengths(pd.read_csv(os.path.join(data_dir, 'fixtures.csv'), parse_dates=['start_date']))
+    player_teams = pd.read_csv(os.path.join(data_dir, 'player_teams.csv'), usecols=['player_id', 'game_id', 'team_id'])
+    seasons = fixtures[['game_id', 'season_year', 'season_type']].drop_duplicates('game_id')
+
+    partitions = {}
+    history_path = os.path.join(data_dir, 'player_history.csv')
+    for chunk_idx, chunk in enumerate(pd.read_csv(history_path, parse_dates=['start_date'], chunksize=chunksize)):
+        chunk_teams = player_teams[player_teams['game_id'].isin(chunk['game_id'])]
+        enriched = join_player_features(chunk, fixtures, chunk_teams)
+        enriched = enriched.merge(seasons, on='game_id', how='left')
+        enriched['season_year'] = enriched['season_year'].fillna(fallback_season_year(enriched['start_date'])).astype(int)
+        enriched['season_type'] = enriched['season_type'].fillna('Unknown')
+        print(f"Chunk {chunk_idx}: {len(chunk)} rows read, {len(enriched)} rows after joining team mappings")
+
+        for (season_year, season_type), part in enriched.groupby(['season_year', 'season_type']):
+            rel_path = partition_path(season_year, season_type)
+            os.makedirs(os.path.join(out_dir, rel_path), exist_ok=True)
+            part.drop(columns=['season_year', 'season_type']).to_parquet(
+                os.path.join(out_dir, rel_path, f"part-{chunk_idx:05d}.parquet"), index=False
+            )
+            entry = partitions.setdefault(rel_path, {
+                'path': rel_path, 'season_year': int(season_year), 'season_type': season_type,
+                'rows': 0, 'min_start_date': None, 'max_start_date': None
+            })
+            entry['rows'] += len(part)
+            lo, hi = part['start_date'].min().isoformat(), part['start_date'].max().isoformat()
+            entry['min_start_date'] = lo if entry['min_start_date'] is None else min(entry['min_start_date'], lo)
+            entry['max_start_date'] = hi if entry['max_start_date'] is None else max(entry['max_start_date'], hi)
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'partitions': sorted(partitions.values(), key=lambda p: p['min_start_date'])
+    }
+    with open(os.path.join(out_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Wrote {len(partitions)} partitions to {out_dir}")
+    return manifest
+
+def load_manifest(root):
+    with open(os.path.join(root, MANIFEST_NAME), 'r') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported partition manifest version {manifest.get('version')} (expected {MANIFEST_VERSION})")
+    return manifest
+
+def streaming_steps(manifest):
+    """Group partitions into chronological steps; partitions whose date ranges
+    overlap are read together so no game arrives after a later one."""
+    steps = []
+    for entry in sorted(manifest['partitions'], key=lambda p: p['min_start_date']):
+        if steps and entry['min_start_date'] <= steps[-1]['max_start_date']:
+            steps[-1]['entries'].append(entry)
+            steps[-1]['max_start_date'] = max(steps[-1]['max_start_date'], entry['max_start_date'])
+        else:
+            steps.append({'entries': [entry], 'max_start_date': entry['max_start_date']})
+    return steps
+
+def read_partition(root, entry, columns=None):
+    directory = os.path.join(root, entry['path'])
+    files = sorted(f for f in os.listdir(directory) if f.endswith('.parquet'))
+    frames = [pd.read_parquet(os.path.join(directory, f), columns=columns) for f in files]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+def iter_partitions(root, columns=None):
+    """Yield (labels, DataFrame) one chronological step at a time."""
+    require_parquet()
+    for step in streaming_steps(load_manifest(root)):
+        labels = [f"{e['season_year']} {e['season_type']}" for e in step['entries']]
+        frames = [read_partition(root, entry, columns) for entry in step['entries']]
+        yield labels, pd.concat(frames, ignore_index=True)
+
+def train_partitioned(root, stats, param_grid, eval_from=None, player_chunks=1):
+    """Stream partitions through the incremental error sums.
+
+    Only one step of partitions plus each player's last max(N) games (the
+    carry-over window state) is held in memory. Unlike the in-memory trainer,
+    windows at the start of a season reach back into the previous partition.
+    Games before eval_from only feed the windows and are not scored.
+    """
+    from incremental_trainer import BUFFER_COLUMNS, empty_state, update_state
+
+    state = empty_state(stats, param_grid)
+    target_from = pd.Timestamp(eval_from) if eval_from else None
+    columns = BUFFER_COLUMNS + list(stats)
+    for labels, frame in iter_partitions(root, columns=columns):
+        if target_from is not None and target_from.tzinfo is None and frame['start_date'].dt.tz is not None:
+            target_from = target_from.tz_localize(frame['start_date'].dt.tz)
+        added = update_state(state, frame, target_from=target_from, player_chunks=player_chunks)
+        print(f"Streamed {', '.join(labels)}: {added} rows, carry-over buffer {len(state['buffer'])} rows")
+    return state
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert player_history.csv into season-partitioned Parquet storage')
+    parser.add_argument('--data_dir', type=str, default=current_dir, help='Directory containing player_history.csv, fixtures.csv and player_teams.csv')
+    parser.add_argument('--out_dir', type=str, default=default_partition_dir, help='Output directory for the partitions')
+    parser.add_argument('--chunksize', type=int, default=250_000, help='Rows of player_history.csv read at a time')
+    parser.add_argument('--overwrite', action='store_true', help='Replace partitions from a previous build')
+    args = parser.parse_args()
+
+    write_partitions(args.data_dir, args.out_dir, chunksize=args.chunksize, overwrite=args.overwrite)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import re
+import unicodedata
+
+# Matches Optic player IDs and names to player_history IDs. The index is built
+# once per dataset, so every fixture in a run shares the lookups and the cache.
+NAME_SUFFIXES = {'jr', 'sr', 'ii', 'iii', 'iv', 'v'}
+RESOLUTION_METHODS = ['exact', 'normalized_id', 'name', 'ambiguous', 'unresolved']
+
+def normalize_id(player_id):
+    return str(player_id).strip().upper()
+
+def normalize_name(name):
+    """'DeMar DeRozan Jr.' and 'demar derozan' both become 'demar derozan'."""
+    if not name:
+        return ''
+    name = unicodedata.normalize('NFKD', str(name)).encode('ascii', 'ignore').decode('ascii').lower()
+    words = re.sub(r"[^a-z0-9 ]+", ' ', name.replace("'", '')).split()
+    while words and words[-1] in NAME_SUFFIXES:
+        words.pop()
+    return ' '.join(words)
+
+class PlayerResolver:
+    def __init__(self, player_ids, player_names=None, game_counts=None):
+        """player_ids are the database IDs; player_names maps some of them to display names.
+
+        When several database IDs normalize to the same key, the one with the
+        most games in game_counts wins, since duplicates are usually a few
+        stray rows under a differently cased ID.
+        """
+        game_counts = game_counts or {}
+        self.ids = set(player_ids)
+        self.by_normalized_id = {}
+        self.id_collisions = {}
+        for player_id in sorted(self.ids, key=lambda p: -game_counts.get(p, 0)):
+            key = normalize_id(player_id)
+            if key in self.by_normalized_id:
+                self.id_collisions.setdefault(key, [self.by_normalized_id[key]]).append(player_id)
+            else:
+                self.by_normalized_id[key] = player_id
+
+        self.by_name = {}
+        for player_id, name in (player_names or {}).items():
+            key = normalize_name(name)
+            if key:
+                self.by_name.setdefault(key, set()).add(self.by_normalized_id.get(normalize_id(player_id), player_id))
+        self.cache = {}
+
+    @classmethod
+    def from_history(cls, player_history):
+        counts = player_history['player_id'].value_counts()
+        names = None
+        if 'player_name' in player_history.columns:
+            latest = player_history.dropna(subset=['player_name']).drop_duplicates('player_id', keep='last')
+            names = dict(zip(latest['player_id'], latest['player_name']))
+        return cls(counts.index, names, counts.to_dict())
+
+    def resolve(self, player_id, player_name=None):
+        """Return (database player ID or None, resolution method)."""
+        key = (player_id, player_name)
+        if key in self.cache:
+            return self.cache[key]
+        if player_id in self.ids:
+            result = (player_id, 'exact')
+        elif normalize_id(player_id) in self.by_normalized_id:
+            result = (self.by_normalized_id[normalize_id(player_id)], 'normalized_id')
+        else:
+            matches = self.by_name.get(normalize_name(player_name), set())
+            if len(matches) == 1:
+                result = (next(iter(matches)), 'name')
+            elif matches:
+                result = (None, 'ambiguous')
+            else:
+                result = (None, 'unresolved')
+        self.cache[key] = result
+        return result
@@ -0,0 +1,218 @@
+import json
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+import socketserver
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import run_predictions
+from run_logging import add_logging_arguments, emit_event, setup_from_args
+
+# Long-lived prediction service: keeps the enriched history and params in memory
+# so /api/run-predictions does not pay a cold start on every call.
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_REFRESH_MINUTES = 30
+
+log = logging.getLogger('prediction_server')
+
+class PredictionService:
+    def __init__(self, state_path=None, refresh_minutes=DEFAULT_REFRESH_MINUTES):
+        self.state_path = state_path
+        self.refresh_seconds = refresh_minutes * 60
+        # Serializes predictions and the swap of freshly loaded data
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.loaded_at = None
+        self.last_refresh_error = None
+        self.stop_event = threading.Event()
+
+    def refresh(self):
+        """Load a new dataset without blocking predictions, then swap it in."""
+        if not self.refresh_lock.acquire(blocking=False):
+            return False
+        try:
+            started = time.perf_counter()
+            if self.state_path:
+                data = run_predictions.read_inference_state(self.state_path)
+            else:
+                data = run_predictions.build_data()
+            with self.lock:
+                run_predictions.install_data(data)
+                self.loaded_at = datetime.now().isoformat()
+                self.last_refresh_error = None
+            log.info(f"Prediction data refreshed in {time.perf_counter() - started:.1f}s")
+            return True
+        except (Exception, SystemExit) as e:
+            # The fetch helpers exit on failure; keep serving the previous data instead
+            self.last_refresh_error = str(e) or type(e).__name__
+            log.error(f"Prediction data refresh failed: {self.last_refresh_error}")
+            emit_event('error', stage='refresh', error=self.last_refresh_error)
+            return False
+        finally:
+            self.refresh_lock.release()
+
+    def refresh_in_background(self):
+        threading.Thread(target=self.refresh, daemon=True).start()
+
+    def _refresh_loop(self):
+        while not self.stop_event.wait(self.refresh_seconds):
+            self.refresh()
+
+    def start_refresh_loop(self):
+        if self.refresh_seconds > 0:
+            threading.Thread(target=self._refresh_loop, daemon=True).start()
+
+    def health(self):
+        history = run_predictions.player_history
+        return {
+            'status': 'ok' if history is not None else 'loading',
+            'loaded_at': self.loaded_at,
+            'source': 'state' if self.state_path else 'supabase',
+            'player_history_rows': 0 if history is None else len(history),
+            'refreshing': self.refresh_lock.locked(),
+            'last_refresh_error': self.last_refresh_error
+        }
+
+    def predict_fixture(self, fixture_id, dry_run):
+        results = []
+        started = time.perf_counter()
+        with self.lock:
+            count = run_predictions.process_fixture(fixture_id, dry_run=dry_run, interactive=False, results=results)
+        return {
+            'success': True,
+            'fixture_id': fixture_id,
+            'dryRun': dry_run,
+            'predictions': count,
+            'results': results,
+            'compute_seconds': round(time.perf_counter() - started, 3),
+            'data_loaded_at': self.loaded_at
+        }
+
+    def predict_slate(self, dry_run):
+        results = []
+        started = time.perf_counter()
+        with self.lock:
+            count = run_predictions.process_slate(dry_run=dry_run, interactive=False, results=results,
+                                                  state_path=run_predictions.slate_state_path)
+        return {
+            'success': True,
+            'dryRun': dry_run,
+            'predictions': count,
+            'results': results,
+            'compute_seconds': round(time.perf_counter() - started, 3),
+            'data_loaded_at': self.loaded_at
+        }
+
+class PredictionRequestHandler(BaseHTTPRequestHandler):
+    service = None
+    token = None
+
+    def address_string(self):
+        # Unix socket clients have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length == 0:
+            return {}
+        return json.loads(self.rfile.read(length).decode('utf-8'))
+
+    def _authorized(self):
+        if self.token and self.headers.get('api-token') != self.token:
+            self._send_json(401, {'error': 'Unauthorized'})
+            return False
+        return True
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        if self.path == '/health':
+            self._send_json(200, self.service.health())
+        else:
+            self._send_json(404, {'error': f'Unknown endpoint {self.path}'})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        try:
+            payload = self._read_json()
+        except ValueError as e:
+            self._send_json(400, {'error': f'Invalid JSON body: {e}'})
+            return
+        dry_run = bool(payload.get('dry_run', False))
+
+        try:
+            if self.path == '/predict/fixture':
+                fixture_id = payload.get('fixture_id')
+                if not fixture_id:
+                    self._send_json(400, {'error': 'fixture_id is required'})
+                    return
+                self._send_json(200, self.service.predict_fixture(fixture_id, dry_run))
+            elif self.path == '/predict/slate':
+                self._send_json(200, self.service.predict_slate(dry_run))
+            elif self.path == '/refresh':
+                self.service.refresh_in_background()
+                self._send_json(202, {'success': True, 'message': 'Refresh started'})
+            else:
+                self._send_json(404, {'error': f'Unknown endpoint {self.path}'})
+        except Exception as e:
+            log.exception(f"Error handling {self.path}")
+            emit_event('error', stage='request', path=self.path, error=str(e) or type(e).__name__)
+            self._send_json(500, {'error': 'Prediction failed', 'details': str(e)})
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def create_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None, token=None):
+    handler = type('BoundPredictionRequestHandler', (PredictionRequestHandler,), {'service': service, 'token': token})
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        return ThreadingUnixHTTPServer(socket_path, handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Resident NBA prop prediction service')
+    parser.add_argument('--host', type=str, default=DEFAULT_HOST, help='Interface to bind the HTTP server to')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='Port for the HTTP server')
+    parser.add_argument('--socket', type=str, help='Serve on this Unix socket instead of TCP', required=False)
+    parser.add_argument('--state', type=str, nargs='?', const=run_predictions.inference_state_path, help='Load from an inference state file instead of Supabase', required=False)
+    parser.add_argument('--refresh_minutes', type=float, default=DEFAULT_REFRESH_MINUTES, help='Background refresh interval (0 disables it)')
+    add_logging_arguments(parser)
+    args = parser.parse_args(argv)
+    setup_from_args(args)
+
+    service = PredictionService(state_path=args.state, refresh_minutes=args.refresh_minutes)
+    log.info("Loading prediction data...")
+    if not service.refresh():
+        log.error("Initial data load failed, not starting the server")
+        sys.exit(1)
+    service.start_refresh_loop()
+
+    server = create_server(service, host=args.host, port=args.port, socket_path=args.socket,
+                           token=os.environ.get('PREDICTION_SERVER_TOKEN'))
+    where = args.socket or f"http://{args.host}:{args.port}"
+    log.info(f"Prediction server listening on {where}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        log.info("Shutting down prediction server")
+    finally:
+        service.stop_event.set()
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
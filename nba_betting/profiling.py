@@ -0,0 +1,115 @@
+import json
+import os
+import sys
+import time
+import threading
+from contextlib import contextmanager
+
+# Timed spans for --profile. Recording is off until enable_profiling() is called,
+# so span() costs one check in normal runs.
+_spans = None
+_origin = None
+
+def enable_profiling():
+    global _spans, _origin
+    _spans = []
+    _origin = time.perf_counter()
+
+def profiling_enabled():
+    return _spans is not None
+
+@contextmanager
+def span(name, category='stage', **args):
+    if _spans is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _spans.append({
+            'name': name,
+            'cat': category,
+            'start': started - _origin,
+            'duration': time.perf_counter() - started,
+            'tid': threading.get_ident(),
+            'args': args
+        })
+
+def summary_rows():
+    """Total, count, mean and max seconds per (category, name), slowest first."""
+    totals = {}
+    for s in _spans or []:
+        row = totals.setdefault((s['cat'], s['name']), {'category': s['cat'], 'name': s['name'], 'count': 0, 'total': 0.0, 'max': 0.0})
+        row['count'] += 1
+        row['total'] += s['duration']
+        row['max'] = max(row['max'], s['duration'])
+    rows = sorted(totals.values(), key=lambda r: r['total'], reverse=True)
+    for row in rows:
+        row['mean'] = row['total'] / row['count']
+    return rows
+
+def print_summary(stream=None):
+    stream = stream or sys.stderr
+    wall = time.perf_counter() - _origin
+    print(f"\nProfile ({wall:.3f}s wall)", file=stream)
+    print(f"{'category':<10} {'name':<40} {'count':>7} {'total s':>10} {'mean ms':>10} {'max ms':>10} {'% wall':>7}", file=stream)
+    for row in summary_rows():
+        print(f"{row['category']:<10} {row['name'][:40]:<40} {row['count']:>7} {row['total']:>10.3f} "
+              f"{row['mean'] * 1000:>10.2f} {row['max'] * 1000:>10.2f} {100 * row['total'] / wall:>6.1f}%", file=stream)
+
+def chrome_trace():
+    events = [{
+        'name': s['name'],
+        'cat': s['cat'],
+        'ph': 'X',
+        'ts': round(s['start'] * 1e6, 1),
+        'dur': round(s['duration'] * 1e6, 1),
+        'pid': os.getpid(),
+        'tid': s['tid'],
+        'args': s['args']
+    } for s in _spans]
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+def speedscope_profile():
+    """Evented speedscope profile of the main thread's spans."""
+    main_tid = threading.main_thread().ident
+    spans = sorted((s for s in _spans if s['tid'] == main_tid), key=lambda s: (s['start'], -s['duration']))
+    frames, frame_index, events, stack = [], {}, [], []
+
+    def close_until(at):
+        while stack and stack[-1][1] <= at:
+            frame, end = stack.pop()
+            events.append({'type': 'C', 'frame': frame, 'at': end})
+
+    for s in spans:
+        key = f"{s['cat']}: {s['name']}"
+        if key not in frame_index:
+            frame_index[key] = len(frames)
+            frames.append({'name': key})
+        end = s['start'] + s['duration']
+        close_until(s['start'])
+        events.append({'type': 'O', 'frame': frame_index[key], 'at': s['start']})
+        stack.append((frame_index[key], end))
+    close_until(float('inf'))
+
+    end_value = max((e['at'] for e in events), default=0.0)
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'evented',
+            'name': 'run_predictions',
+            'unit': 'seconds',
+            'startValue': 0.0,
+            'endValue': end_value,
+            'events': events
+        }]
+    }
+
+def write_trace(path):
+    """Write a speedscope file for *.speedscope.json paths and a Chrome trace otherwise."""
+    trace = speedscope_profile() if path.endswith('.speedscope.json') else chrome_trace()
+    with open(path, 'w') as f:
+        json.dump(trace, f, default=str)
+    print(f"Wrote profile with {len(_spans)} spans to {path}", file=sys.stderr)
@@ -0,0 +1,212 @@
+import numpy as np
+
+# Over/under probabilities for a batch of props by resampling each player's
+# weighted window. A prop has one window per stat it sums (see markets.py), each
+# with that stat's weights over the same past games and its home/away factor,
+# as in run_predictions.predict_player_markets.
+#
+# A prop's outcome is a resampled projection plus an error drawn from the
+# market's error model: quantiles of past out-of-sample errors, in units of the
+# window's spread (see fit_error_model). The in-sample residuals of a short
+# recency-weighted window are far narrower than the errors the projection
+# actually makes, and draws from them gave overconfident probabilities. A model
+# fit against closing lines also says how far to trust the projection where it
+# disagrees with the line.
+DEFAULT_RESAMPLES = 500
+DEFAULT_INTERVAL = 0.9
+# Props resampled together; bounds the (props, resamples, games) index array
+CHUNK_ELEMENTS = 4_000_000
+# Quantiles kept of each market's standardized errors, and the fewest errors to fit them from
+ERROR_QUANTILES = 100
+MIN_ERRORS = 200
+# Floor on a window's spread, in stat units, so a window of equal games still has some
+MIN_SCALE = 0.5
+
+def pack_windows(windows):
+    """Stack per-prop windows into padded arrays.
+
+    windows has one entry per prop: a list of (values, weights, factor) per stat,
+    with values and weights over the same past games, oldest first. Games before
+    the first one any stat weights are dropped. Returns values and weights of
+    shape (props, stats, games), factors of shape (props, stats) and each
+    prop's game count, all zero-padded.
+    """
+    n_stats = max((len(stats) for stats in windows), default=1)
+    trimmed = []
+    for stats in windows:
+        weights = np.vstack([w for _, w, _ in stats])
+        used = np.flatnonzero((weights != 0).any(axis=0))
+        start = used[0] if len(used) else weights.shape[1]
+        trimmed.append((np.vstack([v for v, _, _ in stats])[:, start:], weights[:, start:], [f for _, _, f in stats]))
+    n_games = max((w.shape[1] for _, w, _ in trimmed), default=0)
+
+    values = np.zeros((len(windows), n_stats, n_games))
+    weights = np.zeros((len(windows), n_stats, n_games))
+    factors = np.zeros((len(windows), n_stats))
+    lengths = np.zeros(len(windows), dtype=np.intp)
+    for prop, (v, w, f) in enumerate(trimmed):
+        values[prop, :len(f), :v.shape[1]] = v
+        weights[prop, :len(f), :w.shape[1]] = w
+        factors[prop, :len(f)] = f
+        lengths[prop] = w.shape[1]
+    return values, weights, factors, lengths
+
+def point_estimates(values, weights):
+    """Weighted mean of every stat's window, shape (props, stats)."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.nan_to_num((weights * values).sum(axis=2) / weights.sum(axis=2))
+
+def game_shares(weights):
+    """Each game's share of the window: the stats' average normalized weight, shape (props, games)."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.nan_to_num(weights / weights.sum(axis=2, keepdims=True)).sum(axis=1)
+
+def window_scale(values, weights, factors, point=None):
+    """Weighted standard deviation of each prop's past games around its
+    projection (at least MIN_SCALE), the unit its errors are measured in."""
+    point = point_estimates(values, weights) if point is None else point
+    deviations = ((values - point[:, :, None]) * factors[:, :, None]).sum(axis=1)
+    share = game_shares(weights)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = np.nan_to_num((share * deviations ** 2).sum(axis=1) / share.sum(axis=1))
+    return np.maximum(np.sqrt(variance), MIN_SCALE)
+
+def middle_lines(over_lines, under_lines):
+    """The middle of each prop's over and under lines, or the one it has."""
+    over_lines = np.asarray(over_lines, dtype=float)
+    under_lines = np.asarray(under_lines, dtype=float)
+    return np.where(np.isnan(over_lines), under_lines, np.where(np.isnan(under_lines), over_lines, (over_lines + under_lines) / 2))
+
+def fit_error_model(values, weights, factors, actual, lines=None, quantiles=ERROR_QUANTILES):
+    """One market's error model from past props: {'line_weight', 'errors'}.
+
+    The windows must hold only games before each prop's game (see
+    backtest.prediction_errors), so the errors are out of sample. Without lines
+    the outcome is centred on the projection (line_weight 1). With each prop's
+    closing line (middle_lines) it is centred on
+    line + line_weight * (projection - line), where line_weight is the share of
+    the projection's disagreement with the line that the results bore out (a
+    least-squares fit, kept between 0 and 1). errors are quantiles of
+    (actual - centre) / window_scale. Returns None with fewer than MIN_ERRORS
+    props.
+    """
+    if len(actual) < MIN_ERRORS:
+        return None
+    actual = np.asarray(actual, dtype=float)
+    point = point_estimates(values, weights)
+    centre = (factors * point).sum(axis=1)
+    line_weight = 1.0
+    if lines is not None:
+        disagreement = centre - lines
+        spread = (disagreement ** 2).sum()
+        line_weight = float(np.clip((disagreement * (actual - lines)).sum() / spread, 0, 1)) if spread > 0 else 1.0
+        centre = lines + line_weight * disagreement
+    errors = (actual - centre) / window_scale(values, weights, factors, point)
+    return {
+        'line_weight': round(line_weight, 4),
+        'errors': np.round(np.quantile(errors, (np.arange(quantiles) + 0.5) / quantiles), 4).tolist()
+    }
+
+def error_rows(error_model, markets, quantiles=ERROR_QUANTILES):
+    """Each prop's line weight and row of error quantiles from {market: fit_error_model()};
+    NaN for markets without a model."""
+    line_weights = np.full(len(markets), np.nan)
+    errors = np.full((len(markets), quantiles), np.nan)
+    for prop, market in enumerate(markets):
+        model = error_model.get(market)
+        if model is not None and len(model['errors']) == quantiles:
+            line_weights[prop] = model['line_weight']
+            errors[prop] = model['errors']
+    return line_weights, errors
+
+def bootstrap_props(values, weights, factors, lengths, over_lines, under_lines, resamples=DEFAULT_RESAMPLES,
+                    interval=DEFAULT_INTERVAL, seed=0, errors=None):
+    """Resample every prop's window at once.
+
+    Each resample draws the window's games with replacement and recomputes the
+    weighted mean of every stat, which gives the interval on the projection. An
+    error is added to each resampled projection to get the outcome, and p_over /
+    p_under are the shares of outcomes above the over line and below the under
+    line (NaN without a line). errors is the (line_weights, quantiles) pair
+    from error_rows(): each resampled projection is pulled towards the middle
+    line by its line weight and combined with every error quantile times the
+    window's spread, so the probabilities carry no sampling noise from the
+    errors. Props without a model fall back to one residual per resample drawn
+    from their own window by weight, which is narrower than the real error.
+    Returns a dict of arrays: projection, low, high, p_over and p_under.
+    """
+    rng = np.random.default_rng(seed)
+    n_props, n_stats, n_games = values.shape
+    over_lines = np.asarray(over_lines, dtype=float)
+    under_lines = np.asarray(under_lines, dtype=float)
+    point = point_estimates(values, weights)
+    if errors is None:
+        line_weights, error_quantiles = np.ones(n_props), None
+        modelled = np.zeros(n_props, dtype=bool)
+    else:
+        line_weights, error_quantiles = errors
+        modelled = ~np.isnan(error_quantiles).any(axis=1)
+    # Outcomes are centred between the middle line and the resampled projection
+    lines = middle_lines(over_lines, under_lines)
+    line_weights = np.where(modelled & ~np.isnan(lines), line_weights, 1.0)
+    lines = np.nan_to_num(lines)
+    result = {
+        'projection': (factors * point).sum(axis=1),
+        'low': np.full(n_props, np.nan),
+        'high': np.full(n_props, np.nan),
+        'p_over': np.full(n_props, np.nan),
+        'p_under': np.full(n_props, np.nan)
+    }
+    if n_props == 0 or n_games == 0:
+        return result
+
+    width = n_games if error_quantiles is None else max(n_games, error_quantiles.shape[1])
+    chunk = max(1, CHUNK_ELEMENTS // (resamples * width))
+    quantiles = [(1 - interval) / 2, (1 + interval) / 2]
+    for start in range(0, n_props, chunk):
+        props = slice(start, start + chunk)
+        size = len(lengths[props])
+        length = lengths[props][:, None, None]
+        # Draw as many games as each window has and count how often each game is
+        # drawn; draws past the window land in an extra column that is dropped
+        picks = np.minimum(rng.random((size, resamples, n_games), dtype=np.float32) * length, length - 1).astype(np.int32)
+        picks = np.where(np.arange(n_games) < length, picks, n_games)
+        picks += np.arange(size * resamples, dtype=np.int32).reshape(size, resamples, 1) * (n_games + 1)
+        counts = np.bincount(picks.ravel(), minlength=size * resamples * (n_games + 1))
+        counts = counts.reshape(size, resamples, n_games + 1)[:, :, :n_games].astype(float)
+
+        # Weighted sums of every resample for every stat as one batched product
+        totals = counts @ weights[props].transpose(0, 2, 1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = (counts @ (weights[props] * values[props]).transpose(0, 2, 1)) / totals
+        # A resample with none of a stat's games keeps its point estimate
+        mean = np.where(totals > 0, mean, point[props, None, :])
+        means = (mean * factors[props, None, :]).sum(axis=2)
+
+        centres = lines[props, None] + line_weights[props, None] * (means - lines[props, None])
+        over, under = over_lines[props, None], under_lines[props, None]
+        p_over = np.zeros(size)
+        p_under = np.zeros(size)
+        if not modelled[props].all():
+            # Residual games are drawn by the stats' average normalized weight, so
+            # recent games count as much as in the projection
+            cumulative = np.cumsum(game_shares(weights[props]), axis=1)
+            draws = rng.random((size, resamples)) * cumulative[:, -1:]
+            residual_picks = np.minimum((draws[:, :, None] >= cumulative[:, None, :]).sum(axis=2), length[:, :, 0] - 1)
+            deviations = values[props] - point[props, :, None]
+            residuals = (np.take_along_axis(deviations, residual_picks[:, None, :], axis=2) * factors[props, :, None]).sum(axis=1)
+            outcomes = centres + residuals
+            with np.errstate(invalid='ignore'):
+                p_over, p_under = (outcomes > over).mean(axis=1), (outcomes < under).mean(axis=1)
+        if modelled[props].any():
+            scale = window_scale(values[props], weights[props], factors[props], point[props])
+            # (props, resamples, quantiles): every resampled centre with every error
+            outcomes = centres[:, :, None] + (np.nan_to_num(error_quantiles[props]) * scale[:, None])[:, None, :]
+            with np.errstate(invalid='ignore'):
+                p_over = np.where(modelled[props], (outcomes > over[:, :, None]).mean(axis=(1, 2)), p_over)
+                p_under = np.where(modelled[props], (outcomes < under[:, :, None]).mean(axis=(1, 2)), p_under)
+
+        result['low'][props], result['high'][props] = np.quantile(means, quantiles, axis=1)
+        result['p_over'][props] = np.where(np.isnan(over_lines[props]), np.nan, p_over)
+        result['p_under'][props] = np.where(np.isnan(under_lines[props]), np.nan, p_under)
+    return result
@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+
+from markets import MARKETS, market_stats
+from prop_probability import fit_error_model
+
+# Prop windows as of any past game, for many props at once: each prop's window
+# holds only the player's games before the prop's game, so predictions made from
+# it are out of sample. backtest.py replays closing lines with them, and
+# run_predictions.py fits the bootstrap's error model (prediction_errors) on the
+# history it loads.
+
+# Most recent player games whose out-of-sample errors fit the error model
+ERROR_GAMES = 20000
+
+def history_arrays(player_history, stats):
+    """Columns of player_history sorted by player then date, with each player's rows contiguous.
+
+    key combines the player's code and the game time so a single searchsorted
+    finds, for any (player, time), the end of the games played before it.
+    """
+    ordered = player_history.sort_values(['player_id', 'start_date'], kind='mergesort')
+    codes, players = pd.factorize(ordered['player_id'])
+    seconds = ordered['start_date'].to_numpy(dtype='datetime64[s]').astype(np.int64)
+    n_rows = len(ordered)
+    is_first = np.r_[True, codes[1:] != codes[:-1]] if n_rows else np.zeros(0, dtype=bool)
+    return {
+        'players': pd.Index(players),
+        'starts': np.flatnonzero(is_first),
+        'key': (codes.astype(np.int64) << 40) + (seconds - seconds.min() if n_rows else seconds),
+        'epoch': seconds.min() if n_rows else 0,
+        'game_id': ordered['game_id'].to_numpy(),
+        'home_sign': np.where(ordered['is_home'].to_numpy(dtype=bool), 1.0, -1.0),
+        'opp': ordered['opponent_win_percentage_before'].fillna(0.5).to_numpy(dtype=float),
+        'stats': {stat: ordered[stat].to_numpy(dtype=float) for stat in stats}
+    }
+
+def as_of_windows(arrays, props, all_params):
+    """Windows, projections and outcomes for props (player_id, game_id, market rows).
+
+    Each prop's window is the player's games before the prop's game, up to the
+    largest N among its market's stats, left-aligned as in
+    prop_probability.pack_windows. Weights and the home/away factor follow
+    run_predictions.predict_player_markets. Returns a dict of arrays aligned with props.
+    """
+    n_props = len(props)
+    code = arrays['players'].get_indexer(props['player_id'])
+    known = code >= 0
+    target_seconds = np.maximum(props['start_date'].to_numpy(dtype='datetime64[s]').astype(np.int64) - arrays['epoch'], 0)
+    probe = (np.where(known, code, 0).astype(np.int64) << 40) + target_seconds
+    end = np.searchsorted(arrays['key'], probe, side='left')
+    start = arrays['starts'][np.where(known, code, 0)] if len(arrays['starts']) else np.zeros(n_props, dtype=np.intp)
+    available = np.where(known, end - start, 0)
+
+    # The prop's own game, for the home/away flag and the actual result
+    target = np.minimum(end, len(arrays['key']) - 1)
+    played = known & (end < len(arrays['key'])) & (arrays['game_id'][target] == props['game_id'].to_numpy())
+
+    stats = market_stats(props['market'].unique())
+    n_games = max([all_params[stat]['N'] for stat in stats if stat in all_params], default=0)
+    result = {
+        'values': np.zeros((n_props, 0, n_games)), 'weights': np.zeros((n_props, 0, n_games)),
+        'factors': np.zeros((n_props, 0)), 'lengths': np.zeros(n_props, dtype=np.intp),
+        'projection': np.full(n_props, np.nan), 'actual': np.full(n_props, np.nan), 'played': played
+    }
+    if n_props == 0 or n_games == 0:
+        return result
+
+    markets = props['market'].to_numpy()
+    market_n = {market: max((all_params[stat]['N'] for stat in MARKETS[market] if stat in all_params), default=0)
+                for market in np.unique(markets)}
+    lengths = np.minimum(available, pd.Series(markets).map(market_n).to_numpy())
+    positions = np.arange(n_games)
+    in_window = positions < lengths[:, None]
+    rows = np.where(in_window, end[:, None] - lengths[:, None] + positions, 0)
+    target_sign = arrays['home_sign'][target]
+
+    # Per stat: weights over the window, weighted mean and home/away factor
+    stat_windows = {}
+    for stat in stats:
+        if stat not in all_params:
+            continue
+        params = all_params[stat]
+        N, home_advantage = params['N'], params['home_advantage']
+        recency = params['decay_factor'] ** (lengths[:, None] - 1 - positions)
+        weights = np.where(in_window & (positions >= lengths[:, None] - N),
+                           recency * arrays['opp'][rows] * params.get('opponent_weight', 1.0)
+                           * (1 + home_advantage * arrays['home_sign'][rows]), 0.0)
+        values = np.where(in_window, np.nan_to_num(arrays['stats'][stat][rows]), 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = (weights * values).sum(axis=1) / weights.sum(axis=1)
+        mean[weights.sum(axis=1) == 0] = np.nan
+        stat_windows[stat] = (values, weights, 1 + home_advantage * target_sign, mean)
+
+    n_stats = max(len(MARKETS[market]) for market in market_n)
+    packed_values = np.zeros((n_props, n_stats, n_games))
+    packed_weights = np.zeros((n_props, n_stats, n_games))
+    factors = np.zeros((n_props, n_stats))
+    projection = np.zeros(n_props)
+    actual = np.zeros(n_props)
+    for market in market_n:
+        mask = markets == market
+        for slot, stat in enumerate(MARKETS[market]):
+            if stat not in stat_windows:
+                projection[mask] = np.nan
+                continue
+            values, weights, factor, mean = stat_windows[stat]
+            packed_values[mask, slot] = values[mask]
+            packed_weights[mask, slot] = weights[mask]
+            factors[mask, slot] = factor[mask]
+            projection[mask] += factor[mask] * mean[mask]
+            actual[mask] += arrays['stats'][stat][target[mask]]
+    projection[lengths == 0] = np.nan
+    actual[~played] = np.nan
+    result.update(values=packed_values, weights=packed_weights, factors=factors, lengths=lengths,
+                  projection=projection, actual=actual)
+    return result
+
+def prediction_errors(history, all_params, markets=None, max_games=ERROR_GAMES):
+    """An error model for prop_probability.bootstrap_props from box scores alone:
+    {market: prop_probability.fit_error_model()}, centred on the projection.
+
+    The last max_games player games in history are each predicted from the
+    games before them, as the backtest does, so the errors are out of sample.
+    Markets without parameters for all their stats, or with too few games, are
+    left out.
+    """
+    markets = [market for market in (markets if markets is not None else MARKETS)
+               if all(stat in all_params and stat in history.columns for stat in MARKETS[market])]
+    if not markets or history.empty:
+        return {}
+    history = history.assign(start_date=pd.to_datetime(history['start_date'], utc=True))
+    arrays = history_arrays(history, market_stats(markets))
+    recent = history.sort_values('start_date', kind='mergesort').tail(max_games)[['player_id', 'game_id', 'start_date']]
+    error_model = {}
+    for market in markets:
+        windows = as_of_windows(arrays, recent.assign(market=market).reset_index(drop=True), all_params)
+        usable = ~np.isnan(windows['projection']) & ~np.isnan(windows['actual'])
+        model = fit_error_model(windows['values'][usable], windows['weights'][usable], windows['factors'][usable],
+                                windows['actual'][usable])
+        if model is not None:
+            error_model[market] = model
+    return error_model
@@ -0,0 +1,98 @@
+import os
+import json
+from datetime import datetime, timedelta, timezone
+
+# Progress of a slate run in run_predictions.py, saved after every fixture so a
+# run killed by the API route's timeout or a crash can continue with --resume:
+# the fixtures already finished, the history watermark of the data snapshot the
+# run predicted from, and the custom_projections upserts not yet confirmed.
+# Upserts resolve on (player_id, stat_type), so replaying one is idempotent.
+CHECKPOINT_VERSION = 1
+# A checkpoint older than this belongs to an earlier slate and is not resumed
+DEFAULT_MAX_AGE_HOURS = 12
+
+def write_key(write):
+    return f"{write['player_id']}|{write['stat_type']}"
+
+class RunCheckpoint:
+    def __init__(self, path, state):
+        self.path = path
+        self.state = state
+
+    @classmethod
+    def start(cls, path):
+        """A new checkpoint for a fresh run."""
+        now = datetime.now(timezone.utc).isoformat()
+        return cls(path, {
+            'version': CHECKPOINT_VERSION,
+            'started_at': now,
+            'updated_at': now,
+            'finished': False,
+            'history_watermark': None,
+            'data_path': None,
+            'completed': {},
+            'pending': {}
+        })
+
+    @classmethod
+    def load(cls, path, max_age_hours=DEFAULT_MAX_AGE_HOURS):
+        """The checkpoint at path if it belongs to an unfinished recent run, else None."""
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get('version') != CHECKPOINT_VERSION or state.get('finished'):
+            return None
+        if datetime.fromisoformat(state['updated_at']) < datetime.now(timezone.utc) - timedelta(hours=max_age_hours):
+            return None
+        return cls(path, state)
+
+    @property
+    def data_path(self):
+        """The inference state snapshot the run predicts from, next to the checkpoint."""
+        return self.state['data_path'] or os.path.splitext(self.path)[0] + '.state.json'
+
+    @property
+    def history_watermark(self):
+        return self.state['history_watermark']
+
+    @property
+    def completed(self):
+        return self.state['completed']
+
+    @property
+    def pending(self):
+        """Unconfirmed save_prediction_to_supabase() keyword arguments, oldest first."""
+        return list(self.state['pending'].values())
+
+    def set_data(self, data_path, history_watermark):
+        self.state['data_path'] = data_path
+        self.state['history_watermark'] = history_watermark
+
+    def add_pending(self, writes):
+        """Record writes before they are sent and save, so a kill mid-fixture can replay them."""
+        for write in writes:
+            self.state['pending'][write_key(write)] = write
+        self.save()
+
+    def flushed(self, write):
+        self.state['pending'].pop(write_key(write), None)
+
+    def complete(self, fixture_id, predictions):
+        self.state['completed'][fixture_id] = {'predictions': predictions,
+                                               'completed_at': datetime.now(timezone.utc).isoformat()}
+        self.save()
+
+    def finish(self):
+        self.state['finished'] = not self.state['pending']
+        self.save()
+
+    def save(self):
+        self.state['updated_at'] = datetime.now(timezone.utc).isoformat()
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=1)
+        os.replace(tmp_path, self.path)
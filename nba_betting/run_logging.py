@@ -0,0 +1,67 @@
+import json
+import sys
+import time
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+
+# Leveled logging and the optional JSON-lines event stream for the prediction scripts.
+# Log records go to stderr; events go to their own file (or stdout with "-").
+LOG_LEVELS = ['debug', 'info', 'warning', 'error']
+DEFAULT_LOG_LEVEL = 'warning'
+
+_event_stream = None
+_owns_event_stream = False
+
+def configure_logging(level=DEFAULT_LOG_LEVEL):
+    logging.basicConfig(stream=sys.stderr, format='%(levelname)s %(message)s', force=True)
+    logging.getLogger().setLevel(getattr(logging, level.upper()))
+
+def add_logging_arguments(parser):
+    parser.add_argument('--log_level', choices=LOG_LEVELS, default=DEFAULT_LOG_LEVEL, help='Log level for progress messages on stderr (default: warning)')
+    parser.add_argument('--verbose', action='store_true', help='Shortcut for --log_level info')
+    parser.add_argument('--events', type=str, help='Write JSON-lines progress events to this file ("-" for stdout)', required=False)
+
+def setup_from_args(args):
+    configure_logging('info' if args.verbose and args.log_level == DEFAULT_LOG_LEVEL else args.log_level)
+    if args.events:
+        open_event_stream(args.events)
+
+def open_event_stream(target):
+    global _event_stream, _owns_event_stream
+    close_event_stream()
+    if target == '-':
+        _event_stream, _owns_event_stream = sys.stdout, False
+    else:
+        _event_stream, _owns_event_stream = open(target, 'a'), True
+
+def close_event_stream():
+    global _event_stream, _owns_event_stream
+    if _event_stream is not None and _owns_event_stream:
+        _event_stream.close()
+    _event_stream, _owns_event_stream = None, False
+
+def emit_event(event, **fields):
+    """Write one event line; does nothing unless an event stream is open."""
+    if _event_stream is None:
+        return
+    record = {'ts': datetime.now().isoformat(), 'event': event, **fields}
+    _event_stream.write(json.dumps(record, default=str) + '\n')
+    _event_stream.flush()
+
+@contextmanager
+def stage(name, **fields):
+    """Emit stage_start/stage_end around a block, or stage_error if it raises.
+
+    The block can add fields to the stage_end event through the yielded dict.
+    """
+    emit_event('stage_start', stage=name, **fields)
+    started = time.perf_counter()
+    info = {}
+    try:
+        yield info
+    except BaseException as e:
+        emit_event('stage_error', stage=name, seconds=round(time.perf_counter() - started, 4),
+                   error=str(e) or type(e).__name__, **fields)
+        raise
+    emit_event('stage_end', stage=name, seconds=round(time.perf_counter() - started, 4), **fields, **info)
@@ -0,0 +1,85 @@
+import os
+import json
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+# Orders a slate of upcoming fixtures for run_predictions.py: only games that have
+# not started and tip off within the window, fixtures with new or changed lines
+# first, then by tip-off, and stops starting fixtures once the time budget would
+# be exceeded. Line fingerprints from the last saved run are kept in a JSON file.
+DEFAULT_WINDOW_HOURS = 36
+SKIP_REASONS = ['started', 'out_of_window', 'no_start_date']
+
+def parse_start(value):
+    """An aware UTC datetime for an Optic start_date, or None."""
+    if not value:
+        return None
+    try:
+        start = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return start if start.tzinfo else start.replace(tzinfo=timezone.utc)
+
+def plan_slate(fixtures, now=None, window_hours=DEFAULT_WINDOW_HOURS):
+    """Split fixtures into (due, skipped).
+
+    due is sorted by tip-off and each fixture gets a 'tip_off' datetime;
+    skipped is a list of (fixture, reason) with reason in SKIP_REASONS.
+    """
+    now = now or datetime.now(timezone.utc)
+    horizon = now + timedelta(hours=window_hours)
+    due, skipped = [], []
+    for fixture in fixtures:
+        tip_off = parse_start(fixture.get('start_date'))
+        if tip_off is None:
+            skipped.append((fixture, 'no_start_date'))
+        elif tip_off <= now:
+            skipped.append((fixture, 'started'))
+        elif tip_off > horizon:
+            skipped.append((fixture, 'out_of_window'))
+        else:
+            due.append(dict(fixture, tip_off=tip_off))
+    due.sort(key=lambda fixture: fixture['tip_off'])
+    return due, skipped
+
+def odds_fingerprint(odds_table):
+    """A hash of a fixture's lines and prices that ignores row order."""
+    columns = ['player_id', 'market', 'sportsbook', 'side', 'line', 'price']
+    rows = odds_table[columns].astype(str).agg('|'.join, axis=1).sort_values()
+    return hashlib.sha1('\n'.join(rows).encode()).hexdigest()
+
+def prioritize(due, fingerprints, previous):
+    """Fixtures whose fingerprint is new or differs from previous first, each group by tip-off.
+
+    Sets 'lines_changed' on every fixture.
+    """
+    for fixture in due:
+        seen = previous.get(fixture['id'], {}).get('fingerprint')
+        fixture['lines_changed'] = seen is None or seen != fingerprints.get(fixture['id'])
+    return sorted(due, key=lambda fixture: (not fixture['lines_changed'], fixture['tip_off']))
+
+def fits_budget(remaining_seconds, durations):
+    """Whether another fixture should start with remaining_seconds left.
+
+    The next fixture is expected to take as long as the slowest one so far; before
+    any has finished, there only has to be some time left.
+    """
+    if remaining_seconds is None:
+        return True
+    return remaining_seconds > (max(durations) if durations else 0)
+
+def read_state(path):
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def write_state(path, state, now=None, keep_days=7):
+    """Save fingerprints, dropping fixtures processed more than keep_days ago."""
+    cutoff = ((now or datetime.now(timezone.utc)) - timedelta(days=keep_days)).isoformat()
+    state = {fixture_id: entry for fixture_id, entry in state.items() if entry.get('processed_at', '') >= cutoff}
+    with open(path, 'w') as f:
+        json.dump(state, f, indent=2)
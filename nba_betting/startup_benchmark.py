@@ -0,0 +1,96 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+# Cold-start check for run_predictions.py: every run starts a fresh interpreter
+current_dir = os.path.dirname(os.path.abspath(__file__))
+script_path = os.path.join(current_dir, "run_predictions.py")
+
+# Seconds allowed for the median run of each case
+DEFAULT_HELP_BUDGET = 0.5
+DEFAULT_DEBUG_PLAYER_BUDGET = 3.0
+
+# Runs run_predictions.main() for --debug_player and stops once the Supabase
+# client exists, so the time covers imports, argument parsing and client setup
+# but not the download itself.
+DEBUG_PLAYER_PROBE = """
+import os
+import sys
+sys.path.insert(0, {directory!r})
+import run_predictions
+
+real_get_supabase = run_predictions.get_supabase
+
+def get_supabase():
+    real_get_supabase()
+    sys.stdout.flush()
+    os._exit(0)
+
+run_predictions.get_supabase = get_supabase
+run_predictions.main(['--debug_player', {player_id!r}])
+"""
+
+def time_command(command, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        completed = subprocess.run(command, cwd=current_dir, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        elapsed = time.perf_counter() - started
+        if completed.returncode != 0:
+            print(f"ERROR: {' '.join(command[:3])} exited with code {completed.returncode}")
+            print(completed.stderr.strip())
+            sys.exit(1)
+        timings.append(elapsed)
+    return timings
+
+def run_benchmark(runs=3, help_budget=DEFAULT_HELP_BUDGET, debug_player_budget=DEFAULT_DEBUG_PLAYER_BUDGET,
+                  player_id="4B75CA28FA43"):
+    cases = [
+        ('help', [sys.executable, script_path, '--help'], help_budget),
+        ('debug_player', [sys.executable, '-c', DEBUG_PLAYER_PROBE.format(directory=current_dir, player_id=player_id)],
+         debug_player_budget),
+    ]
+    results = []
+    for name, command, budget in cases:
+        timings = time_command(command, runs)
+        median = statistics.median(timings)
+        results.append({
+            'case': name,
+            'runs': runs,
+            'min_seconds': round(min(timings), 4),
+            'median_seconds': round(median, 4),
+            'max_seconds': round(max(timings), 4),
+            'budget_seconds': budget,
+            'passed': median <= budget
+        })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Fail if run_predictions.py cold start goes over budget')
+    parser.add_argument('--runs', type=int, default=3, help='Fresh interpreter runs per case')
+    parser.add_argument('--help_budget', type=float, default=DEFAULT_HELP_BUDGET, help='Budget in seconds for --help')
+    parser.add_argument('--debug_player_budget', type=float, default=DEFAULT_DEBUG_PLAYER_BUDGET, help='Budget in seconds for --debug_player up to the first Supabase request')
+    parser.add_argument('--player_id', type=str, default="4B75CA28FA43", help='Player ID passed to --debug_player')
+    parser.add_argument('--json_out', type=str, help='Optional path for the results as JSON', required=False)
+    args = parser.parse_args()
+
+    results = run_benchmark(runs=args.runs, help_budget=args.help_budget,
+                            debug_player_budget=args.debug_player_budget, player_id=args.player_id)
+    for result in results:
+        status = 'ok' if result['passed'] else 'OVER BUDGET'
+        print(f"{result['case']:<14} median {result['median_seconds']:.3f}s (min {result['min_seconds']:.3f}s, "
+              f"max {result['max_seconds']:.3f}s), budget {result['budget_seconds']:.2f}s: {status}")
+
+    if args.json_out:
+        with open(args.json_out, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if not all(result['passed'] for result in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
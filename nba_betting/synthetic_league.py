@@ -0,0 +1,265 @@
+import os
+import pandas as pd
+import numpy as np
+
+from markets import MARKETS
+from nba_prop_trainer import current_dir
+
+# Synthetic leagues for benchmarks and the local fake services: either box scores
+# on top of the real fixtures.csv/player_teams.csv season, or a whole generated league.
+SPORTSBOOKS = ['DraftKings', 'FanDuel', 'BetMGM']
+STAT_COLUMNS = ['points', 'assists', 'total_rebounds', 'three_point_field_goals_made', 'steals', 'blocks']
+
+def load_season(data_dir=current_dir):
+    fixtures = pd.read_csv(os.path.join(data_dir, 'fixtures.csv'), parse_dates=['start_date'])
+    player_teams = pd.read_csv(os.path.join(data_dir, 'player_teams.csv'), usecols=['player_id', 'game_id', 'team_id'])
+    return fixtures, player_teams
+
+def replicate_seasons(fixtures, player_teams, scale):
+    """Stack scale copies of the season, each shifted back 52 weeks with its own game IDs."""
+    fixture_copies, team_copies = [], []
+    for i in range(scale):
+        fx = fixtures.copy()
+        pt = player_teams.copy()
+        if i > 0:
+            fx['start_date'] = fx['start_date'] - pd.Timedelta(weeks=52 * i)
+            fx['game_id'] = f"S{i}-" + fx['game_id']
+            if 'id' in fx.columns:
+                fx['id'] = f"S{i}-" + fx['id'].astype(str)
+            pt['game_id'] = f"S{i}-" + pt['game_id']
+        fixture_copies.append(fx)
+        team_copies.append(pt)
+    return pd.concat(fixture_copies, ignore_index=True), pd.concat(team_copies, ignore_index=True)
+
+def synthetic_player_history(fixtures, player_teams, seed=0):
+    """One box score per player_teams row, drawn around a per-player scoring level."""
+    rng = np.random.default_rng(seed)
+    history = player_teams.merge(fixtures[['game_id', 'start_date']], on='game_id', how='inner')
+    players = history['player_id'].unique()
+    level = pd.Series(rng.gamma(2.0, 6.0, len(players)), index=players)
+    mu = history['player_id'].map(level).to_numpy()
+    history = history[['player_id', 'game_id', 'start_date']].copy()
+    history['player_name'] = 'Player ' + history['player_id']
+    history['points'] = rng.poisson(mu)
+    history['assists'] = rng.poisson(mu / 4)
+    history['total_rebounds'] = rng.poisson(mu / 3)
+    history['three_point_field_goals_made'] = rng.poisson(mu / 10)
+    history['steals'] = rng.poisson(1.0, len(history))
+    history['blocks'] = rng.poisson(0.5, len(history))
+    return history.sort_values(['start_date', 'player_id'], kind='mergesort').reset_index(drop=True)
+
+def build_league(data_dir=current_dir, scale=1, seed=0):
+    """Return (player_history, fixtures, player_teams) at scale times one season."""
+    fixtures, player_teams = load_season(data_dir)
+    fixtures, player_teams = replicate_seasons(fixtures, player_teams, scale)
+    return synthetic_player_history(fixtures, player_teams, seed=seed), fixtures, player_teams
+
+def upcoming_slate(player_current_team, latest_wins, start_date):
+    """Pair every team into one upcoming game; returns (fixture rows, {game_id: player_ids})."""
+    teams = sorted(set(player_current_team.values()))
+    players_by_team = {}
+    for player_id, team_id in player_current_team.items():
+        players_by_team.setdefault(team_id, []).append(player_id)
+    games, players = [], {}
+    for i in range(0, len(teams) - 1, 2):
+        home, away = teams[i], teams[i + 1]
+        game_id = f"SLATE-{i // 2}"
+        games.append({
+            'game_id': game_id,
+            'start_date': start_date,
+            'home_competitors': [{'id': home, 'name': home}],
+            'away_competitors': [{'id': away, 'name': away}],
+            'home_team_id': home,
+            'away_team_id': away,
+            'home_team_win_percentage_before': latest_wins.get(home, 0.5),
+            'away_team_win_percentage_before': latest_wins.get(away, 0.5),
+        })
+        players[game_id] = players_by_team[home] + players_by_team[away]
+    return games, players
+
+def odds_payload(game_id, player_ids, seed=0):
+    """A /fixtures/odds style response with over and under points/assists/rebounds lines
+    for each player at each of SPORTSBOOKS."""
+    rng = np.random.default_rng(seed)
+    odds = []
+    for player_id in player_ids:
+        for market, mean in (('Player Points', 14.5), ('Player Assists', 3.5), ('Player Rebounds', 5.5)):
+            main_line = float(np.floor(rng.gamma(4.0, mean / 4.0))) + 0.5
+            for book in SPORTSBOOKS:
+                line = max(main_line + float(rng.integers(-1, 2)), 0.5)
+                over_price = int(rng.choice([-130, -120, -115, -110, -105, 100]))
+                for side, price in (('over', over_price), ('under', -220 - over_price)):
+                    odds.append({
+                        'player_id': player_id,
+                        'selection': f"Player {player_id}",
+                        'selection_line': side,
+                        'market': market,
+                        'points': line,
+                        'price': price,
+                        'sportsbook': book,
+                        'is_main': True
+                    })
+    return {'data': [{'game_id': game_id, 'odds': odds}]}
+
+def american_price(probability):
+    """American odds for implied probabilities."""
+    probability = np.asarray(probability, dtype=float)
+    return np.where(probability >= 0.5, -100 * probability / (1 - probability), 100 * (1 - probability) / probability).round().astype(int)
+
+def historical_lines(player_history, markets=('points', 'assists', 'total_rebounds', 'points_rebounds_assists'), seed=0):
+    """Odds snapshots for completed games, in the odds_table.SNAPSHOT_COLUMNS layout.
+
+    Each book's line is the player's average over the previous 20 games, shaded
+    by up to a point, and priced from a Poisson with that average plus a little
+    noise and 4.5% vig, so lines are fair apart from the vig. Snapshots are
+    taken two hours before the game; games without 5 earlier games get no line.
+    """
+    from scipy.stats import poisson
+
+    rng = np.random.default_rng(seed)
+    history = player_history.sort_values(['player_id', 'start_date'], kind='mergesort')
+    captured_at = pd.to_datetime(history['start_date'], utc=True) - pd.Timedelta(hours=2)
+    frames = []
+    for market in markets:
+        value = history[MARKETS[market]].sum(axis=1)
+        previous = value.groupby(history['player_id']).shift()
+        average = previous.groupby(history['player_id']).rolling(20, min_periods=5).mean().reset_index(level=0, drop=True)
+        has_line = average.notna().to_numpy()
+        games = history.loc[has_line, ['game_id', 'player_id']]
+        games_captured_at = captured_at[has_line].to_numpy()
+        main_line = np.floor(average[has_line].to_numpy()) + 0.5
+        for book in SPORTSBOOKS:
+            line = np.maximum(main_line + rng.integers(-1, 2, len(games)), 0.5)
+            over = np.clip(poisson.sf(np.floor(line), average[has_line].to_numpy()) + rng.normal(0, 0.02, len(games)), 0.05, 0.95)
+            for side, price in (('over', american_price(over + 0.0225)), ('under', american_price(1 - over + 0.0225))):
+                frames.append(pd.DataFrame({
+                    'captured_at': games_captured_at,
+                    'fixture_id': None,
+                    'game_id': games['game_id'].to_numpy(),
+                    'player_id': games['player_id'].to_numpy(),
+                    'market': market,
+                    'sportsbook': book,
+                    'side': side,
+                    'line': line,
+                    'price': price
+                }))
+    return pd.concat(frames, ignore_index=True)
+
+def _hex_ids(rng, n):
+    return [f"{value:012X}" for value in rng.choice(16 ** 12, size=n, replace=False)]
+
+def generate_league(n_teams=30, players_per_team=12, games_per_team=82, seasons=1, season_start='2024-10-22',
+                    upcoming_games=None, seed=0):
+    """Generate teams, completed fixtures, rosters and box scores from scratch.
+
+    Every game day about half the teams play, so a season lasts about twice
+    games_per_team days. The returned dict also holds the next day's slate
+    ('upcoming') with Optic-style player prop lines per fixture ('odds').
+    """
+    rng = np.random.default_rng(seed)
+    team_ids = _hex_ids(rng, n_teams)
+    team_numbers = rng.choice(np.arange(10000, 40000), size=n_teams, replace=False)
+    strength = rng.normal(0.0, 1.0, n_teams)
+    teams = [{'id': team_ids[t], 'name': f"Team {t + 1}", 'abbreviation': f"T{t + 1:02d}", 'numerical_id': int(team_numbers[t])}
+             for t in range(n_teams)]
+
+    player_ids = _hex_ids(rng, n_teams * players_per_team)
+    player_team = np.repeat(np.arange(n_teams), players_per_team)
+    level = rng.gamma(2.0, 6.0, len(player_ids))
+
+    games_per_day = max(n_teams // 4, 1)
+    season_days = -(-games_per_team * n_teams // (2 * games_per_day))
+    fixtures, roster_rows, box_scores = [], [], []
+    fixture_ids = iter(_hex_ids(rng, games_per_day * season_days * seasons + n_teams))
+    for season in range(seasons):
+        season_day = pd.Timestamp(season_start, tz='UTC') + pd.DateOffset(years=season) + pd.Timedelta(hours=23, minutes=30)
+        for _ in range(season_days):
+            order = rng.permutation(n_teams)
+            for home, away in order[:2 * games_per_day].reshape(-1, 2):
+                game_id = f"{team_numbers[home]}-{team_numbers[away]}-{season_day.strftime('%Y-%m-%d')}"
+                home_win = rng.random() < 1.0 / (1.0 + np.exp(-(strength[home] - strength[away] + 0.3)))
+                winner_score = int(rng.normal(114, 9))
+                loser_score = winner_score - int(rng.integers(1, 20))
+                fixtures.append({
+                    'id': next(fixture_ids),
+                    'game_id': game_id,
+                    'start_date': season_day,
+                    'home_competitors': [teams[home]],
+                    'away_competitors': [teams[away]],
+                    'home_team_display': teams[home]['name'],
+                    'away_team_display': teams[away]['name'],
+                    'status': 'completed',
+                    'home_score_total': winner_score if home_win else loser_score,
+                    'away_score_total': loser_score if home_win else winner_score,
+                    'season_year': season_day.year if season_day.month >= 8 else season_day.year - 1,
+                    'season_type': 'Regular Season'
+                })
+                for team in (home, away):
+                    # About one player in ten sits out each game
+                    roster = np.flatnonzero((player_team == team) & (rng.random(len(player_ids)) > 0.1))
+                    for p in roster:
+                        roster_rows.append((player_ids[p], game_id, team_ids[team]))
+                        box_scores.append((player_ids[p], game_id, season_day, p))
+            season_day += pd.Timedelta(days=1)
+
+    player_teams = pd.DataFrame(roster_rows, columns=['player_id', 'game_id', 'team_id'])
+    history = pd.DataFrame(box_scores, columns=['player_id', 'game_id', 'start_date', '_player'])
+    mu = level[history['_player'].to_numpy()]
+    history['player_name'] = 'Player ' + history['player_id']
+    history['points'] = rng.poisson(mu)
+    history['assists'] = rng.poisson(mu / 4)
+    history['total_rebounds'] = rng.poisson(mu / 3)
+    history['three_point_field_goals_made'] = rng.poisson(mu / 10)
+    history['steals'] = rng.poisson(1.0, len(history))
+    history['blocks'] = rng.poisson(0.5, len(history))
+    history = history.drop(columns=['_player'])
+
+    # Next day's slate: every team plays once unless upcoming_games is smaller
+    upcoming, odds = [], {}
+    order = rng.permutation(n_teams)[:2 * min(upcoming_games or n_teams // 2, n_teams // 2)]
+    for home, away in order.reshape(-1, 2):
+        fixture_id = next(fixture_ids)
+        game_id = f"{team_numbers[home]}-{team_numbers[away]}-{season_day.strftime('%Y-%m-%d')}"
+        upcoming.append({
+            'id': fixture_id,
+            'game_id': game_id,
+            'start_date': season_day.isoformat().replace('+00:00', 'Z'),
+            'home_competitors': [teams[home]],
+            'away_competitors': [teams[away]],
+            'home_team_display': teams[home]['name'],
+            'away_team_display': teams[away]['name'],
+            'status': 'unplayed',
+            'is_live': False,
+            'sport': {'id': 'basketball'},
+            'league': {'id': 'nba'}
+        })
+        lines = []
+        for p in np.flatnonzero(np.isin(player_team, [home, away])):
+            for market, share in (('Player Points', 1.0), ('Player Assists', 0.25), ('Player Rebounds', 1 / 3),
+                                  ('Player Made Threes', 0.1), ('Player Points + Rebounds + Assists', 1 + 0.25 + 1 / 3)):
+                main_line = float(np.floor(level[p] * share)) + 0.5
+                # Books shade the line by up to a point and the over price around -110
+                for book in SPORTSBOOKS:
+                    line = max(main_line + float(rng.integers(-1, 2)), 0.5)
+                    over_price = int(rng.choice([-130, -120, -115, -110, -105, 100]))
+                    for side, price in (('over', over_price), ('under', -220 - over_price)):
+                        lines.append({
+                            'player_id': player_ids[p],
+                            'selection': f"Player {player_ids[p]}",
+                            'selection_line': side,
+                            'name': f"Player {player_ids[p]} {side.capitalize()} {line}",
+                            'market': market,
+                            'points': line,
+                            'price': price,
+                            'sportsbook': book,
+                            'is_main': True
+                        })
+        odds[fixture_id] = {'id': fixture_id, 'game_id': game_id, 'odds': lines}
+
+    return {
+        'fixtures': pd.DataFrame(fixtures),
+        'player_teams': player_teams,
+        'player_history': history,
+        'upcoming': upcoming,
+        'odds': odds
+    }
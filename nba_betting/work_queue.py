@@ -0,0 +1,175 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+
+# Shared job queue for sharding a slate across worker processes
+# (run_predictions.py --coordinator / --worker). One row per fixture; a worker
+# claims the queued job with the best priority and holds it under a lease it
+# renews while working. A job whose lease ran out (its worker died or hung) can
+# be claimed again, up to max_attempts claims in all.
+#
+# A SQLite file serves workers on one machine; a postgresql:// URL serves any
+# number of machines, claiming with FOR UPDATE SKIP LOCKED.
+DEFAULT_LEASE_SECONDS = 120
+DEFAULT_MAX_ATTEMPTS = 3
+STATUSES = ['queued', 'leased', 'done', 'failed']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prediction_jobs (
+  job_id TEXT PRIMARY KEY,
+  payload TEXT NOT NULL,
+  priority INTEGER NOT NULL,
+  status TEXT NOT NULL,
+  attempts INTEGER NOT NULL DEFAULT 0,
+  worker TEXT,
+  lease_expires_at DOUBLE PRECISION,
+  enqueued_at DOUBLE PRECISION NOT NULL,
+  finished_at DOUBLE PRECISION,
+  predictions INTEGER,
+  error TEXT
+)
+"""
+
+# A job a worker may take: queued, or leased by a worker whose lease ran out
+CLAIMABLE = "(status = 'queued' OR (status = 'leased' AND lease_expires_at < ?)) AND attempts < ?"
+
+# Re-enqueueing a fixture resets it for the new slate unless a worker holds it right now
+ENQUEUE = """
+INSERT INTO prediction_jobs (job_id, payload, priority, status, attempts, enqueued_at)
+VALUES (?, ?, ?, 'queued', 0, ?)
+ON CONFLICT (job_id) DO UPDATE SET payload = excluded.payload, priority = excluded.priority, status = 'queued',
+  attempts = 0, worker = NULL, lease_expires_at = NULL, enqueued_at = excluded.enqueued_at, finished_at = NULL,
+  predictions = NULL, error = NULL
+WHERE prediction_jobs.status != 'leased' OR prediction_jobs.lease_expires_at < excluded.enqueued_at
+"""
+
+class WorkQueue:
+    """SQLite-backed queue. Every call uses its own connection, so a queue can be
+    shared by threads (the lease renewal) and by processes on the same machine."""
+    placeholder = '?'
+    skip_locked = ''
+
+    def __init__(self, path, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._execute(SCHEMA)
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        return connection
+
+    def _execute(self, sql, params=(), many=False):
+        """Run one statement in its own transaction and return its rows."""
+        sql = sql.replace('?', self.placeholder)
+        connection = self._connect()
+        try:
+            # BEGIN IMMEDIATE takes the write lock up front, so two claims cannot pick the same row
+            connection.execute('BEGIN IMMEDIATE')
+            if many:
+                connection.executemany(sql, params)
+                rows = []
+            else:
+                rows = connection.execute(sql, params).fetchall()
+            connection.execute('COMMIT')
+            return rows
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        finally:
+            connection.close()
+
+    def enqueue(self, jobs):
+        """Queue (job_id, payload dict) pairs; earlier pairs get the better priority."""
+        now = time.time()
+        self._execute(ENQUEUE, [(job_id, json.dumps(payload), priority, now) for priority, (job_id, payload) in enumerate(jobs)],
+                      many=True)
+
+    def claim(self, worker):
+        """Lease the next job to worker; returns (job_id, payload, attempts) or None."""
+        now = time.time()
+        rows = self._execute(f"""
+            UPDATE prediction_jobs SET status = 'leased', worker = ?, lease_expires_at = ?, attempts = attempts + 1
+            WHERE job_id = (SELECT job_id FROM prediction_jobs WHERE {CLAIMABLE} ORDER BY priority, job_id LIMIT 1{self.skip_locked})
+            RETURNING job_id, payload, attempts""", (worker, now + self.lease_seconds, now, self.max_attempts))
+        if not rows:
+            return None
+        job_id, payload, attempts = rows[0]
+        return job_id, json.loads(payload), attempts
+
+    def renew(self, job_id, worker):
+        """Extend worker's lease on job_id; False if it lost the job to another worker."""
+        rows = self._execute("""
+            UPDATE prediction_jobs SET lease_expires_at = ? WHERE job_id = ? AND worker = ? AND status = 'leased'
+            RETURNING job_id""", (time.time() + self.lease_seconds, job_id, worker))
+        return bool(rows)
+
+    def complete(self, job_id, worker, predictions):
+        """Mark job_id done; False if worker no longer held it."""
+        rows = self._execute("""
+            UPDATE prediction_jobs SET status = 'done', finished_at = ?, predictions = ?, error = NULL
+            WHERE job_id = ? AND worker = ? AND status = 'leased'
+            RETURNING job_id""", (time.time(), predictions, job_id, worker))
+        return bool(rows)
+
+    def fail(self, job_id, worker, error):
+        """Give job_id back for a retry, or mark it failed once it used all its attempts."""
+        self._execute("""
+            UPDATE prediction_jobs SET status = CASE WHEN attempts < ? THEN 'queued' ELSE 'failed' END,
+              worker = NULL, lease_expires_at = NULL, finished_at = ?, error = ?
+            WHERE job_id = ? AND worker = ? AND status = 'leased'""", (self.max_attempts, time.time(), error, job_id, worker))
+
+    def reap(self):
+        """Mark jobs failed whose last lease ran out with no attempts left; returns their ids."""
+        now = time.time()
+        rows = self._execute("""
+            UPDATE prediction_jobs SET status = 'failed', finished_at = ?, error = 'lease expired'
+            WHERE status = 'leased' AND lease_expires_at < ? AND attempts >= ?
+            RETURNING job_id""", (now, now, self.max_attempts))
+        return [job_id for job_id, in rows]
+
+    def counts(self):
+        """Jobs per status, with every status present."""
+        rows = self._execute("SELECT status, COUNT(*) FROM prediction_jobs GROUP BY status")
+        return dict({status: 0 for status in STATUSES}, **dict(rows))
+
+    def jobs(self):
+        columns = ['job_id', 'status', 'attempts', 'worker', 'predictions', 'error']
+        rows = self._execute(f"SELECT {', '.join(columns)} FROM prediction_jobs ORDER BY priority, job_id")
+        return [dict(zip(columns, row)) for row in rows]
+
+class PostgresWorkQueue(WorkQueue):
+    """The same queue in a Postgres table, for workers on several machines."""
+    placeholder = '%s'
+    skip_locked = ' FOR UPDATE SKIP LOCKED'
+
+    def __init__(self, url, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        try:
+            import psycopg
+        except ImportError:
+            print("ERROR: A postgresql:// queue needs psycopg")
+            print("Please run: pip install 'psycopg[binary]'")
+            sys.exit(1)
+        self.psycopg = psycopg
+        super().__init__(url, lease_seconds, max_attempts)
+
+    def _execute(self, sql, params=(), many=False):
+        sql = sql.replace('?', self.placeholder)
+        # The connection context manager commits on success and rolls back on error
+        with self.psycopg.connect(self.path) as connection:
+            with connection.cursor() as cursor:
+                if many:
+                    cursor.executemany(sql, params)
+                    return []
+                cursor.execute(sql, params)
+                return cursor.fetchall() if cursor.description else []
+
+def open_queue(location, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """A PostgresWorkQueue for a postgres:// or postgresql:// URL, else a WorkQueue on that SQLite file."""
+    if location.startswith(('postgres://', 'postgresql://')):
+        return PostgresWorkQueue(location, lease_seconds, max_attempts)
+    os.makedirs(os.path.dirname(os.path.abspath(location)), exist_ok=True)
+    return WorkQueue(location, lease_seconds, max_attempts)